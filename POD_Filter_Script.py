@@ -6,6 +6,7 @@ Created on Thu Sep 26 11:37:58 2019
 """
 
 import os  # This is to understand which separator in the paths (/ or \)
+import sys
 
 import matplotlib.image as mpimg
 import numpy as np  # This is for doing math
@@ -23,17 +24,31 @@ def generate_filename(folder, number, pair, pic_format):
     return folder + os.sep + 'A'+'%03d' % (number + 1) + pair + '.' + pic_format
 
 
-# Image Cropping, Flipping and pre-processing using the 1POD mode removal
+# Image Cropping, Flipping and pre-processing using the 1POD mode removal and an optional frequency filter
 # Fore more advanced version, see https://seis.bristol.ac.uk/~aexrt/PIVPODPreprocessing/
-# To do list: Implement Frequency based filter.
 
 # Ensure current working directory
 cwd = os.path.dirname(os.path.realpath(__file__))
 os.chdir(cwd) #chdir used for change directory
 print(os.getcwd())
 
+# The frequency filter (and the optional cache) are shared with the GUI in pod_filter_gui_full
+sys.path.insert(0, os.path.join(cwd, 'pod_filter_gui_full'))
+from functions.frequency_filter import frequency_filter
+# Uncomment the two lines after CACHE = None to cache the decoded images on disk, so repeated runs skip decoding.
+# The stacks are keyed like the GUI's batches, so the GUI finds them when one of its batches holds
+# the same n_t image pairs with the same crop (flipped, not cut) - and the other way round
+CACHE = None
+# from functions.stack_cache import StackCache
+# CACHE = StackCache()
+
 # Folder in
 FOL_IN = 'RAW_IMAGES'
+# Precision of the data matrices. np.float32 halves the memory and is enough for 8/12-bit images;
+# the correlation matrices are always accumulated in float64
+DTYPE = np.float64
+# Compare the filtered matrices with a float64 computation (projects every tile twice)
+CHECK_PRECISION = False
 # Processing Images
 FOL_OUT = 'Pre_Pro_PIV_IMAGES'  # Where will the result be
 if not os.path.exists(FOL_OUT):
@@ -47,6 +62,8 @@ Name=generate_filename(FOL_IN, 10, 'a', 'tif')
 
 Im = imread(Name, as_gray=True)
 ny, nx = Im.shape
+# The filtered images are saved with the bit depth of the raw images (8, 12 or 16 bit)
+SOURCE_DTYPE = imread(Name).dtype
 # Prepare for cropping (at this point you might want to check if the crop is ok)
 X1 = 0
 X2 = nx
@@ -81,7 +98,7 @@ def process_image_for_matrix_D(FOL_IN, iter, pair, X1, X2, Y1, Y2):
     :param X2: int
     :param Y1: int
     :param Y2: int
-    :return: np.float64 array
+    :return: DTYPE array
     """
     name = generate_filename(FOL_IN, iter, pair, pic_format="tif")  # Check it out: print(Name)
     print(name)
@@ -91,62 +108,131 @@ def process_image_for_matrix_D(FOL_IN, iter, pair, X1, X2, Y1, Y2):
     crop_img = Im[Y1:Y2, X1:X2]
     # Perform also the flipping
     Crop_FLIP = np.fliplr(crop_img)
-    Imd = np.float64(Crop_FLIP)  # We work with floating number not integers
+    Imd = Crop_FLIP.astype(DTYPE)  # We work with floating number not integers
     ImV = np.reshape(Imd, ((nx * ny, 1)))  # Reshape into a column Vector
     return ImV
 
 
 n_t = 100  # Number of Image Pairs
-D_a = np.zeros((nx * ny, n_t))  # Initialize the Data matrix for image sequences A.
-D_b = np.zeros((nx * ny, n_t))  # Initialize the Data matrix for image sequences B.
+D_a = np.zeros((nx * ny, n_t), dtype=DTYPE)  # Initialize the Data matrix for image sequences A.
+D_b = np.zeros((nx * ny, n_t), dtype=DTYPE)  # Initialize the Data matrix for image sequences B.
+
+# The cache key changes if an image, the crop or the flipping changes (the GUI builds the key of a batch the same way)
+if CACHE is not None:
+    key_a = CACHE.key([generate_filename(FOL_IN, k, 'a', 'tif') for k in range(n_t)], [X1, X2, Y1, Y2], True, False, 'a')
+    key_b = CACHE.key([generate_filename(FOL_IN, k, 'b', 'tif') for k in range(n_t)], [X1, X2, Y1, Y2], True, False, 'b')
+    cached_a = CACHE.load(key_a, D_a)
+    cached_b = CACHE.load(key_b, D_b)
+else:
+    cached_a = cached_b = False
 
 for k in range(0, n_t):
     # Prepare the Matrix D_a
-    ImV = process_image_for_matrix_D(FOL_IN=FOL_IN, iter=k, pair='a', X1=X1, X2=X2, Y1=Y1, Y2=Y2)
-    print('Loading ' + str(k) + '/' + str(n_t))  # Print a Message to update the user
-    D_a[:, k] = ImV[:, 0]
+    if not cached_a:
+        ImV = process_image_for_matrix_D(FOL_IN=FOL_IN, iter=k, pair='a', X1=X1, X2=X2, Y1=Y1, Y2=Y2)
+        print('Loading ' + str(k) + '/' + str(n_t))  # Print a Message to update the user
+        D_a[:, k] = ImV[:, 0]
 
     # Prepare the Matrix D_b
-    ImV = process_image_for_matrix_D(FOL_IN=FOL_IN, iter=k, pair='b', X1=X1, X2=X2, Y1=Y1, Y2=Y2)
-    print('Loading ' + str(k) + '/' + str(n_t))  # Print a Message to update the user
-    D_b[:, k] = ImV[:, 0]
+    if not cached_b:
+        ImV = process_image_for_matrix_D(FOL_IN=FOL_IN, iter=k, pair='b', X1=X1, X2=X2, Y1=Y1, Y2=Y2)
+        print('Loading ' + str(k) + '/' + str(n_t))  # Print a Message to update the user
+        D_b[:, k] = ImV[:, 0]
+
+if CACHE is not None:
+    if cached_a:
+        print('D_a loaded from cache')
+    else:
+        CACHE.store(key_a, D_a)
+    if cached_b:
+        print('D_b loaded from cache')
+    else:
+        CACHE.store(key_b, D_b)
 
 ################ Computing the Filtered Matrices##########################
 Ind_S = 1  # Number of modes to remove. If 0, the filter is not active!
+TILE = 4096  # Number of pixels (rows of D) processed at once
+
+
+def correlation_matrix(D):
+    """
+    Correlation matrix K = D^T D, accumulated in float64 over blocks of rows
+    :param D: np.array data matrix
+    :return: np.float64 array
+    """
+    K = np.zeros((D.shape[1], D.shape[1]))
+    for start in range(0, D.shape[0], TILE):
+        tile = np.float64(D[start:start + TILE])
+        K += np.dot(tile.transpose(), tile)
+    return K
+
+
+def filter_matrix(D, Psi):
+    """
+    Remove the modes in Psi from D, computed in the precision of D
+    :param D: np.array data matrix
+    :param Psi: np.float64 array with the temporal modes to remove
+    :return: filtered matrix and the max deviation from a float64 computation (None if not checked)
+    """
+    D_filt = np.empty_like(D)
+    PsiD = Psi.astype(D.dtype)
+    check = CHECK_PRECISION and D.dtype != np.float64
+    max_dev = 0.0 if check else None
+    for start in range(0, D.shape[0], TILE):
+        tile = D[start:start + TILE]
+        D_filt[start:start + TILE] = tile - np.dot(np.dot(tile, PsiD), PsiD.transpose())
+        if check:
+            reference = np.float64(tile) - np.dot(np.dot(np.float64(tile), Psi), Psi.transpose())
+            max_dev = max(max_dev, np.max(np.abs(D_filt[start:start + TILE] - reference)))
+    return D_filt, max_dev
+
+
 # Compute the correlation matrix
 print('Computing Correlation Matrices')
-K_a = np.dot(D_a.transpose(), D_a)
+K_a = correlation_matrix(D_a)
 print('K_a Ready')
-K_b = np.dot(D_b.transpose(), D_b)
+K_b = correlation_matrix(D_b)
 print('K_b Ready')
 
 # Comput the Temporal basis for A
 Psi, Lambda, _ = np.linalg.svd(K_a)
 
-# Compute the Projection Matrix
-PSI_CROP = Psi[:, Ind_S::]
-PROJ = np.dot(PSI_CROP, PSI_CROP.transpose())
-D_a_filt = np.dot(D_a, PROJ)
-print('D_a Filt Ready')
+# Remove the first Ind_S modes (same as projecting on the remaining ones)
+D_a_filt, max_dev = filter_matrix(D_a, Psi[:, :Ind_S])
+print('D_a Filt Ready' if max_dev is None else 'D_a Filt Ready (max deviation from float64: %.3g)' % max_dev)
 
 # Comput the Temporal basis for B
 Psi, Lambda, _ = np.linalg.svd(K_b)
 
-# Compute the Projection Matrix
-PSI_CROP = Psi[:, Ind_S::]
-PROJ = np.dot(PSI_CROP, PSI_CROP.transpose())
-D_b_filt = np.dot(D_b, PROJ)
-print('D_b Filt Ready')
+# Remove the first Ind_S modes (same as projecting on the remaining ones)
+D_b_filt, max_dev = filter_matrix(D_b, Psi[:, :Ind_S])
+print('D_b Filt Ready' if max_dev is None else 'D_b Filt Ready (max deviation from float64: %.3g)' % max_dev)
+
+################ Frequency Filter ##########################
+# Remove the frequencies of periodic reflections from the time series of every pixel (FFT over the images).
+# Applied after the POD; with Ind_S = 0 it replaces the mode removal.
+# None to skip, 'high-pass' removes everything below F_LOW, 'band-stop' removes F_LOW to F_HIGH
+FREQ_FILTER = None
+F_S = 15.0  # Acquisition rate of the image pairs [Hz]
+F_LOW = 0.1  # [Hz]
+F_HIGH = 1.0  # [Hz]
+
+if FREQ_FILTER is not None:
+    frequency_filter(D_a_filt, FREQ_FILTER, F_LOW, F_HIGH, frameRate=F_S)
+    print('D_a Frequency Filter Ready')
+    frequency_filter(D_b_filt, FREQ_FILTER, F_LOW, F_HIGH, frameRate=F_S)
+    print('D_b Frequency Filter Ready')
 
 
 # Prepare Exporting the images
-def export_images(matrix, folder, n_images, pair, shape):
+def export_images(matrix, folder, n_images, pair, shape, dtype):
     """
     :param matrix: np.array matrix to extract the images
     :param folder: str folder out
     :param n_images: int number of images
     :param pair: str "a" or "b"
     :param shape: tuple
+    :param dtype: integer type of the saved images
     """
     (ny, nx) = shape
     for k in range(0, n_images):
@@ -154,9 +240,9 @@ def export_images(matrix, folder, n_images, pair, shape):
         print('Exporting %i'%k)
         Imd_V = matrix[:, k]
         Im = np.reshape(Imd_V, ((ny, nx)))
-        Im[Im < 0] = 0  # Things below 0 are treated as zero
-        Im2 = np.uint8(Im)
+        # Things below 0 are treated as zero, values above the range saturate instead of wrapping around
+        Im2 = np.clip(Im, 0, np.iinfo(dtype).max).astype(dtype)
         imsave(name, Im2)
 
-export_images(D_a_filt, FOL_OUT, n_images=n_t, pair='a', shape=(ny, nx))
-export_images(D_b_filt, FOL_OUT, n_images=n_t, pair='b', shape=(ny, nx))
+export_images(D_a_filt, FOL_OUT, n_images=n_t, pair='a', shape=(ny, nx), dtype=SOURCE_DTYPE)
+export_images(D_b_filt, FOL_OUT, n_images=n_t, pair='b', shape=(ny, nx), dtype=SOURCE_DTYPE)
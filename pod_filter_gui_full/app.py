@@ -11,6 +11,7 @@ sys.path.insert(0,str(FILE_PATH))
 os.chdir(FILE_PATH)
 
 from PyQt5 import QtWidgets, QtGui
+import multiprocessing
 import sys 
 
 #Import our main window file
@@ -37,4 +38,6 @@ def main():
 
 #Run script if it is main
 if __name__ == '__main__':
+    #The batch and decoding workers are spawned processes, in the frozen app they start this executable again
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
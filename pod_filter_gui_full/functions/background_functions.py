@@ -0,0 +1,500 @@
+#Background subtraction and frequency filters - cheap alternatives to the POD filter
+#They read, crop and flip the images, run the pipeline and save the images like the POD engine,
+#only the filtering of a batch is different. Like the POD engine they don't need Qt
+
+from functions.pod_engine import PODEngine
+from functions.frequency_filter import frequency_filter, TILE_BYTES
+import numpy as np
+
+#Per-pixel backgrounds computed over the whole image list
+BACKGROUND_LIST = ['mean', 'min', 'percentile']
+
+#Per-pixel backgrounds computed over a window of frames centred on every image, for backgrounds that drift
+SLIDING_BACKGROUND_LIST = ['sliding-min', 'sliding-median']
+
+
+#Bytes per pixel of computing a sliding background of nColumns images from dataColumns images (with the halo)
+#The minimum keeps a running minimum from each side, the median the levels of the pixels, their histograms
+#(with the coarse ones) and the background on levels and in float
+def sliding_pixel_bytes(backgroundType, dataColumns, nColumns, itemsize, nLevels = 256):
+    if backgroundType == 'sliding-min':
+        return (2*dataColumns + nColumns) * itemsize
+
+    return 2*dataColumns + 2*nLevels*17//16 + 16 + nColumns * (2 + 8 + itemsize)
+
+#Pixels of D filtered at once, so the work of the sliding backgrounds stays around TILE_BYTES
+def sliding_tile_pixels(backgroundType, dataColumns, nColumns, itemsize, nLevels = 256):
+    return max(1, TILE_BYTES // sliding_pixel_bytes(backgroundType, dataColumns, nColumns, itemsize, nLevels))
+
+
+#The percentile is exact while every frame is kept - up to EXACT_PERCENTILE_IMAGES frames that fit in
+#PERCENTILE_BYTES for each frame set. Longer image lists switch to the (approximate) P-square estimate
+EXACT_PERCENTILE_IMAGES = 256
+PERCENTILE_BYTES = 512 * 1024**2
+
+#Frames kept for an exact percentile of nPixels pixels, at least the five the P-square markers start from
+def exact_percentile_images(nPixels, itemsize):
+    return max(5, min(EXACT_PERCENTILE_IMAGES, PERCENTILE_BYTES // (nPixels * itemsize)))
+
+
+#Running percentile of every pixel with the P-square algorithm (Jain and Chlamtac), vectorized over the pixels
+#The first exactImages frames are kept and give the exact percentile, after them only five markers are kept
+#per pixel, so the memory doesn't depend on the number of images
+class StreamingPercentile:
+    def __init__(self, nPixels, percentile, exactImages = 5):
+        self.p = percentile/100
+        self.count = 0
+
+        #Frames kept until the markers take over, allocated with the first one
+        self.exactImages = max(5, exactImages)
+        self.frames = None
+
+        #Marker heights and positions (from 0) for every pixel
+        self.q = None
+        self.n = None
+
+        #Desired marker positions are the same for every pixel
+        self.desired = None
+        self.increment = np.array([0, self.p/2, self.p, (1 + self.p)/2, 1])
+
+        self.nPixels = nPixels
+
+    #Start the markers from the sorted frames - at the ranks of the minimum, p/2, p, (1+p)/2 and the maximum
+    def start_markers(self):
+        nFrames = self.count
+        self.frames.sort(axis = 0)
+
+        self.desired = (nFrames - 1) * np.array([0, self.p/2, self.p, (1 + self.p)/2, 1])
+        ranks = np.round(self.desired).astype(np.int64)
+        for i in range(1, 4):
+            ranks[i] = min(max(ranks[i], ranks[i-1] + 1), nFrames - 5 + i)
+
+        self.q = self.frames[ranks].astype(np.float64)
+        self.n = np.repeat(ranks.astype(np.float64)[:, None], self.nPixels, axis = 1)
+        self.frames = None
+
+    def add(self, x):
+        if self.count < self.exactImages:
+            if self.frames is None:
+                self.frames = np.empty((self.exactImages, self.nPixels), dtype = np.asarray(x).dtype)
+
+            self.frames[self.count] = x
+            self.count += 1
+            return
+
+        if self.q is None:
+            self.start_markers()
+
+        x = np.asarray(x, dtype = np.float64)
+        self.count += 1
+
+        q, n = self.q, self.n
+
+        #Extend the outer markers and find the cell of every pixel (0 to 3)
+        np.minimum(q[0], x, out = q[0])
+        np.maximum(q[4], x, out = q[4])
+        cell = (x >= q[1]).astype(np.int8) + (x >= q[2]) + (x >= q[3])
+
+        #Markers above the cell move up one position
+        for i in range(1, 5):
+            n[i] += cell < i
+
+        self.desired += self.increment
+
+        #Adjust the middle markers that are a position or more away from where they should be
+        for i in range(1, 4):
+            offset = self.desired[i] - n[i]
+            moveUp = (offset >= 1) & (n[i+1] - n[i] > 1)
+            moveDown = (offset <= -1) & (n[i-1] - n[i] < -1)
+            move = moveUp | moveDown
+
+            if not move.any():
+                continue
+
+            step = np.where(moveUp[move], 1.0, -1.0)
+            qi, qBelow, qAbove = q[i][move], q[i-1][move], q[i+1][move]
+            ni, nBelow, nAbove = n[i][move], n[i-1][move], n[i+1][move]
+
+            #Piecewise parabolic prediction, linear if it would leave the neighbouring markers
+            parabolic = qi + step/(nAbove - nBelow) * ((ni - nBelow + step)*(qAbove - qi)/(nAbove - ni) +
+                                                       (nAbove - ni - step)*(qi - qBelow)/(ni - nBelow))
+            linear = qi + step*(np.where(step > 0, qAbove, qBelow) - qi)/(np.where(step > 0, nAbove, nBelow) - ni)
+
+            q[i][move] = np.where((qBelow < parabolic) & (parabolic < qAbove), parabolic, linear)
+            n[i][move] += step
+
+    #Exact while we still have every frame, the P-square estimate after
+    def value(self):
+        if self.q is None:
+            return np.percentile(self.frames[:self.count], self.p*100, axis = 0)
+
+        return self.q[2]
+
+
+#Minimum of every row of D over the windows of 2*halfWindow+1 columns centred on columns (shorter at the ends of D)
+#van Herk/Gil-Werman: the columns are split in blocks of one window, every window covers the end of one block
+#and the start of the next, so it is the minimum of a running minimum from each side. This is what a monotone
+#deque gives, with three minimums per value whatever the window length, but the same steps for every pixel
+def sliding_min(D, halfWindow, columns):
+    nColumns = D.shape[1]
+    window = 2*halfWindow + 1
+
+    #Running minimum from the start and from the end of every block
+    forward = np.empty(D.shape, dtype = D.dtype, order = 'F')
+    backward = np.empty(D.shape, dtype = D.dtype, order = 'F')
+
+    for j in range(0, nColumns):
+        if j % window == 0:
+            forward[:, j] = D[:, j]
+        else:
+            np.minimum(forward[:, j-1], D[:, j], out = forward[:, j])
+
+    for j in reversed(range(0, nColumns)):
+        if j % window == window - 1 or j == nColumns - 1:
+            backward[:, j] = D[:, j]
+        else:
+            np.minimum(backward[:, j+1], D[:, j], out = backward[:, j])
+
+    minimum = np.empty((D.shape[0], len(columns)), dtype = D.dtype, order = 'F')
+    for c, j in enumerate(columns):
+        first = max(j - halfWindow, 0)
+        last = min(j + halfWindow, nColumns - 1)
+
+        #A window inside one block starts at the block start, or is cut short by the end of D
+        if first // window == last // window:
+            if first % window == 0:
+                minimum[:, c] = forward[:, last]
+            else:
+                minimum[:, c] = backward[:, first]
+        else:
+            np.minimum(backward[:, first], forward[:, last], out = minimum[:, c])
+
+    return minimum
+
+#Median of every row of Q (integer levels below nLevels) over the windows of 2*halfWindow+1 columns centred
+#on columns (shorter at the ends of Q, the lower median for an even number of frames)
+#Sliding histogram (Huang): every pixel keeps a histogram of its window and the level of its median,
+#a new frame adds one count and removes one, then the median moves to its new level. A coarse histogram
+#of blocks of levels lets it skip over empty levels a block at a time
+def sliding_median(Q, halfWindow, columns, nLevels, blockLevels = 16):
+    nPixels, nColumns = Q.shape
+    pixels = np.arange(nPixels)
+
+    #Histograms of every pixel, level major so a level of all pixels is contiguous
+    countType = np.uint16 if 2*halfWindow + 1 < 2**16 else np.uint32
+    histogram = np.zeros(nLevels * nPixels, dtype = countType)
+    coarse = np.zeros(-(-nLevels // blockLevels) * nPixels, dtype = countType)
+
+    #Level of the median and number of values in the levels below it
+    level = np.zeros(nPixels, dtype = np.int64)
+    below = np.zeros(nPixels, dtype = np.int64)
+
+    #Window in the histograms is [first, last)
+    first, last = 0, 0
+
+    median = np.empty((nPixels, len(columns)), dtype = Q.dtype, order = 'F')
+    for c, j in enumerate(columns):
+        while last < min(j + halfWindow + 1, nColumns):
+            values = Q[:, last].astype(np.int64)
+            histogram[values * nPixels + pixels] += 1
+            coarse[values // blockLevels * nPixels + pixels] += 1
+            below += values < level
+            last += 1
+
+        while first < max(j - halfWindow, 0):
+            values = Q[:, first].astype(np.int64)
+            histogram[values * nPixels + pixels] -= 1
+            coarse[values // blockLevels * nPixels + pixels] -= 1
+            below -= values < level
+            first += 1
+
+        #The median is the value with rank values below it
+        rank = (last - first - 1) // 2
+
+        #Move the median of the pixels that are off, a whole block at a time from the start of a block
+        active = pixels
+        while active.size > 0:
+            activeLevel = level[active]
+            activeBelow = below[active]
+            block = activeLevel // blockLevels
+            blockStart = activeLevel % blockLevels == 0
+
+            moveDown = activeBelow > rank
+            moveUp = ~moveDown & (activeBelow + histogram[activeLevel * nPixels + active] <= rank)
+
+            blockDown = moveDown & blockStart & (activeBelow - coarse[np.maximum(block - 1, 0) * nPixels + active] > rank)
+            blockUp = moveUp & blockStart & (activeBelow + coarse[block * nPixels + active] <= rank)
+
+            moving = active[blockDown]
+            below[moving] -= coarse[(level[moving] // blockLevels - 1) * nPixels + moving]
+            level[moving] -= blockLevels
+
+            moving = active[moveDown & ~blockDown]
+            level[moving] -= 1
+            below[moving] -= histogram[level[moving] * nPixels + moving]
+
+            moving = active[blockUp]
+            below[moving] += coarse[level[moving] // blockLevels * nPixels + moving]
+            level[moving] += blockLevels
+
+            moving = active[moveUp & ~blockUp]
+            below[moving] += histogram[level[moving] * nPixels + moving]
+            level[moving] += 1
+
+            active = active[moveDown | moveUp]
+
+        median[:, c] = level
+
+    return median
+
+
+class BackgroundEngine(PODEngine):
+    def __init__(self, imageList, saveFolder, settings, **callbacks):
+        super(BackgroundEngine, self).__init__(imageList, saveFolder, settings, **callbacks)
+
+        #Per-pixel temporal statistic subtracted from every image - 'mean', 'min' or 'percentile'
+        self.backgroundType = settings.get('background', 'mean')
+        self.percentile = settings.get('percentile', 10)
+
+        #Background of the A and B frames
+        self.background = None
+
+    #The background is computed over every image before the first batch
+    def prepare_filter(self):
+        self.compute_background()
+
+    #One streaming pass over the batches, only a per-pixel statistic of each frame set is kept
+    def compute_background(self):
+        ny, nx = self.imageShape
+        nImages = self.batchStarts[-1]
+
+        statistics = {}
+        for frameSet in ['a', 'b']:
+            if self.backgroundType == 'min':
+                statistics[frameSet] = np.full(nx * ny, np.inf)
+            elif self.backgroundType == 'mean':
+                statistics[frameSet] = np.zeros(nx * ny)
+            else:
+                exactImages = min(nImages, exact_percentile_images(nx * ny, self.dtype.itemsize))
+                statistics[frameSet] = StreamingPercentile(nx * ny, self.percentile, exactImages)
+
+        for batch in range(0, self.nBatches):
+            matrices = self.decode_batch(batch)
+
+            with self.stage('background', batch, matrices['a'].nbytes + matrices['b'].nbytes):
+                for frameSet in ['a', 'b']:
+                    D = matrices[frameSet]
+
+                    if self.backgroundType == 'min':
+                        np.minimum(statistics[frameSet], D.min(axis = 1), out = statistics[frameSet])
+                    elif self.backgroundType == 'mean':
+                        statistics[frameSet] += D.sum(axis = 1, dtype = np.float64)
+                    else:
+                        for k in range(0, D.shape[1]):
+                            statistics[frameSet].add(D[:, k])
+
+            self.progress((batch+1)/self.nBatches*100, 'Computing %s background: batch %i of %i'%(self.backgroundType, batch+1, self.nBatches))
+
+        self.background = {}
+        for frameSet in ['a', 'b']:
+            if self.backgroundType == 'min':
+                background = statistics[frameSet]
+            elif self.backgroundType == 'mean':
+                background = statistics[frameSet] / nImages
+            else:
+                background = statistics[frameSet].value()
+
+            self.background[frameSet] = background.astype(self.dtype)
+
+    #Batch workers subtract the background computed here
+    def worker_state(self, batch):
+        state = super(BackgroundEngine, self).worker_state(batch)
+        state['background'] = self.background
+
+        return state
+
+    #Subtract the background from a batch (in place)
+    def compute_batch(self, batch, slot, matrices):
+        self.progress(0, '[Batch %i of %i] Subtracting Background'%(batch+1, self.nBatches))
+
+        with self.stage('filter', batch, matrices['a'].nbytes + matrices['b'].nbytes):
+            for frameSet in ['a', 'b']:
+                D = matrices[frameSet]
+                np.subtract(D, self.background[frameSet][:, None], out = D)
+
+                if isinstance(D, np.memmap):
+                    D.flush()
+
+        self.D_a_filt = matrices['a']
+        self.D_b_filt = matrices['b']
+        self.residentBatch = batch
+        self.residentSlot = slot
+
+        self.progress(100, '[Batch %i of %i] Finished Computing'%(batch+1, self.nBatches))
+
+        return self.D_a_filt, self.D_b_filt
+
+    #There are no modes to change
+    def refilter(self, nModes):
+        return True
+
+
+class SlidingBackgroundEngine(PODEngine):
+    def __init__(self, imageList, saveFolder, settings, **callbacks):
+        super(SlidingBackgroundEngine, self).__init__(imageList, saveFolder, settings, **callbacks)
+
+        #'sliding-min' or 'sliding-median' over the window of frames centred on every image
+        self.backgroundType = settings.get('background', 'sliding-min')
+        self.halfWindow = settings.get('window', 21) // 2
+
+        #The median is found on this many levels between the smallest and largest value of a batch
+        #Integer images are exact if their range of values fits, otherwise the median is quantized (and we say so)
+        self.medianLevels = settings.get('medianLevels', 256)
+
+    #Images of the neighbouring batches needed for the windows at the start and end of a batch
+    def halo(self, batch):
+        before = min(self.halfWindow, self.batchStarts[batch])
+        after = min(self.halfWindow, self.batchStarts[-1] - self.batchStarts[batch+1])
+
+        return before, after
+
+    def batch_columns(self):
+        return self.nPairs + 2*self.halfWindow
+
+    #Decode a batch together with its halo, the windows then don't depend on how the images are split in batches
+    def decode_batch(self, batch, slot = 0):
+        before, after = self.halo(batch)
+
+        return self.decode_images(batch, slot, range(self.batchStarts[batch] - before, self.batchStarts[batch+1] + after))
+
+    #Subtract the sliding background from the images of the batch (in place), the halo images are left out
+    def compute_batch(self, batch, slot, matrices):
+        self.progress(0, '[Batch %i of %i] Subtracting %s Background'%(batch+1, self.nBatches, self.backgroundType))
+
+        before, after = self.halo(batch)
+        nImages = len(self.batch_images(batch))
+        columns = range(before, before + nImages)
+
+        filtered = {}
+        for frameSet in ['a', 'b']:
+            D = matrices[frameSet]
+            filtered[frameSet] = D[:, before:before + nImages]
+
+            with self.stage('filter', batch, D.nbytes):
+                if self.backgroundType == 'sliding-median':
+                    levels = self.median_levels(D, batch, frameSet)
+
+                #The backgrounds are computed a tile of pixels at a time, a tile is only changed once its background is known
+                tilePixels = sliding_tile_pixels(self.backgroundType, D.shape[1], nImages, self.dtype.itemsize, self.medianLevels)
+                for start in range(0, D.shape[0], tilePixels):
+                    rows = slice(start, start + tilePixels)
+
+                    if self.backgroundType == 'sliding-min':
+                        background = sliding_min(D[rows], self.halfWindow, columns)
+                    else:
+                        background = self.median_background(D[rows], columns, *levels)
+
+                    np.subtract(filtered[frameSet][rows], background, out = filtered[frameSet][rows])
+
+                if isinstance(D, np.memmap):
+                    D.flush()
+
+            self.progress(50 if frameSet == 'a' else 100, '[Batch %i of %i] Subtracted %s background'%(batch+1, self.nBatches, frameSet.upper()))
+
+        self.D_a_filt = filtered['a']
+        self.D_b_filt = filtered['b']
+        self.residentBatch = batch
+        self.residentSlot = slot
+
+        self.progress(100, '[Batch %i of %i] Finished Computing'%(batch+1, self.nBatches))
+
+        return self.D_a_filt, self.D_b_filt
+
+    #Levels of the sliding median of D - the lowest value, the step between levels and the number of levels
+    #Reports it if the median is quantized, i.e. the values of the images don't fit in medianLevels levels
+    def median_levels(self, D, batch, frameSet):
+        low, high = float(D.min()), float(D.max())
+
+        #Integer images use whole steps, so a small range of values is exact
+        integerImages = np.issubdtype(self.sourceDtype, np.integer)
+        if integerImages:
+            step = max(1.0, (high - low + 1) / self.medianLevels)
+        elif high > low:
+            step = (high - low) / (self.medianLevels - 1)
+        else:
+            step = 1.0
+
+        nLevels = min(int(np.rint((high - low) / step)) + 1, self.medianLevels)
+
+        if integerImages and step > 1.0:
+            self.progress(0, '[Batch %i of %i] %s images span %i values, the median is quantized to %i levels of %.3g (medianLevels %i for an exact median)'%(
+                          batch+1, self.nBatches, frameSet.upper(), int(high - low + 1), nLevels, step, int(high - low + 1)))
+        elif not integerImages and high > low:
+            self.progress(0, '[Batch %i of %i] The median of the %s images is quantized to %i levels of %.3g'%(batch+1, self.nBatches, frameSet.upper(), nLevels, step))
+
+        return low, step, nLevels
+
+    #Sliding median of D on the levels from median_levels
+    def median_background(self, D, columns, low, step, nLevels):
+        Q = np.empty(D.shape, dtype = np.uint16 if nLevels <= 2**16 else np.uint32, order = 'F')
+        for start in range(0, D.shape[1], self.convertColumns):
+            block = np.rint((D[:, start:start + self.convertColumns] - low) / step)
+            np.clip(block, 0, nLevels - 1, out = block)
+            Q[:, start:start + self.convertColumns] = block
+
+        median = sliding_median(Q, self.halfWindow, columns, nLevels)
+
+        return (low + median * step).astype(self.dtype)
+
+    #There are no modes to change
+    def refilter(self, nModes):
+        return True
+
+
+class FrequencyEngine(PODEngine):
+    def __init__(self, imageList, saveFolder, settings, **callbacks):
+        super(FrequencyEngine, self).__init__(imageList, saveFolder, settings, **callbacks)
+
+        #'high-pass' or 'band-stop' on the time series of every pixel in a batch, cutoffs in Hz
+        self.frequencyFilter = settings.get('frequencyFilter', 'high-pass')
+        self.lowCutoff = settings.get('lowCutoff', 0.1)
+        self.highCutoff = settings.get('highCutoff', 1.0)
+        self.frameRate = settings.get('frameRate', 15.0)
+
+        #Remove the POD modes first and filter what is left
+        self.removeModes = settings.get('removeModes', False)
+
+        #Threads of the FFTs, -1 uses every core
+        self.fftWorkers = settings.get('fftWorkers', -1)
+
+    def compute_batch(self, batch, slot, matrices):
+        if self.removeModes:
+            super(FrequencyEngine, self).compute_batch(batch, slot, matrices)
+        else:
+            self.D_a_filt = matrices['a']
+            self.D_b_filt = matrices['b']
+            self.residentBatch = batch
+            self.residentSlot = slot
+
+        for frameSet, D in [('a', self.D_a_filt), ('b', self.D_b_filt)]:
+            self.progress(0 if frameSet == 'a' else 50, '[Batch %i of %i] Frequency filtering %s images'%(batch+1, self.nBatches, frameSet.upper()))
+            with self.stage('fft', batch, D.nbytes):
+                self.apply_filter(D)
+
+        self.progress(100, '[Batch %i of %i] Finished Computing'%(batch+1, self.nBatches))
+
+        return self.D_a_filt, self.D_b_filt
+
+    def apply_filter(self, D):
+        return frequency_filter(D, self.frequencyFilter, self.lowCutoff, self.highCutoff, self.frameRate, self.fftWorkers)
+
+    #Modes added back or removed by refilter go through the same filter, the FFT filter is linear
+    def filtered_modes(self, Psi):
+        return self.apply_filter(np.array(Psi.transpose())).transpose()
+
+    #Only the number of removed modes can change
+    def refilter(self, nModes):
+        if self.removeModes:
+            return super(FrequencyEngine, self).refilter(nModes)
+
+        return True
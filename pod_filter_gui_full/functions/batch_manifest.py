@@ -0,0 +1,71 @@
+#Manifests of the saved batches, so an interrupted run can be resumed
+#Every saved batch gets a JSON file with the hash of the settings it was filtered with, its frames,
+#eigenvalues, timings and output files. A batch is complete if its manifest matches the settings and its files exist
+#This module doesn't need Qt, so the GUI and pod_cli.py share it
+
+from pathlib import Path
+import hashlib
+import json
+import os
+
+#Folder of the manifests in the save folder
+MANIFEST_FOLDER = 'manifests'
+
+#Settings that only change how a run is done, not the images it saves
+RUNTIME_SETTINGS = ['decodeWorkers', 'decodeBackend', 'writeWorkers', 'batchWorkers', 'blasThreads', 'fftWorkers',
+                    'memoryBudget', 'streaming', 'scratchFolder', 'cacheFolder', 'cacheSize', 'tileSize',
+                    'convertColumns', 'keepModes', 'fullSpectrum', 'resume', 'progressRate', 'runId',
+                    'keepCoefficients', 'checkPrecision']
+
+
+#Hash of everything that changes the saved images - the filter, its settings and the images (path, size and time)
+def settings_hash(engineName, settings, imagePaths):
+    outputSettings = {key: value for key, value in settings.items() if key not in RUNTIME_SETTINGS}
+
+    keyHash = hashlib.sha1()
+    keyHash.update(engineName.encode())
+    keyHash.update(json.dumps(outputSettings, sort_keys = True, default = str).encode())
+
+    for imagePath in imagePaths:
+        imagePath = Path(imagePath).resolve()
+        stat = imagePath.stat()
+        keyHash.update(('%s|%i|%i\n'%(imagePath, stat.st_size, stat.st_mtime_ns)).encode())
+
+    return keyHash.hexdigest()
+
+def manifest_path(saveFolder, batch):
+    return Path(saveFolder) / MANIFEST_FOLDER / ('batch_%04i.json'%batch)
+
+#Write the manifest of a batch, through a temporary file so a manifest is never read half written
+def write_manifest(saveFolder, batch, manifest):
+    manifestPath = manifest_path(saveFolder, batch)
+    manifestPath.parent.mkdir(parents = True, exist_ok = True)
+
+    tempPath = manifestPath.with_suffix('.%i.tmp'%os.getpid())
+    with open(tempPath, 'w') as manifestFile:
+        json.dump(manifest, manifestFile, indent = 1)
+
+    os.replace(tempPath, manifestPath)
+
+#Manifest of a batch, None if there isn't a readable one
+def read_manifest(saveFolder, batch):
+    try:
+        with open(manifest_path(saveFolder, batch)) as manifestFile:
+            return json.load(manifestFile)
+    except (OSError, ValueError):
+        return None
+
+#Remove the manifest of a batch before its images are written again
+def remove_manifest(saveFolder, batch):
+    try:
+        manifest_path(saveFolder, batch).unlink()
+    except FileNotFoundError:
+        pass
+
+#True if the batch was saved with these settings and all its files are still there
+def batch_complete(saveFolder, batch, settingsHash):
+    manifest = read_manifest(saveFolder, batch)
+    if manifest is None or manifest.get('settingsHash') != settingsHash:
+        return False
+
+    return all((Path(saveFolder) / fileName).exists() for fileName in manifest.get('outputFiles', []))
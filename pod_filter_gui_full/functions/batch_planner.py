@@ -0,0 +1,203 @@
+#Memory planner of the batches - predicts the peak memory of filtering a batch from the crop, the dtype,
+#the number of images and the filter, then picks the largest batch that fits the memory budget
+#The pairs are spread over the batches so none are dropped. This module doesn't need Qt
+
+import numpy as np
+import os
+
+from functions.pod_engine import auto_dtype, output_dtype
+from functions.background_functions import SLIDING_BACKGROUND_LIST, sliding_pixel_bytes, sliding_tile_pixels, exact_percentile_images
+from functions.frequency_filter import FREQUENCY_FILTER_LIST, TILE_BYTES
+
+#Part of the physical memory we plan for when there isn't a memory budget
+MEMORY_FRACTION = 0.5
+
+#Names of the parts of the memory of a batch, in the order they are shown
+MEMORY_PARTS = [('data', 'data'), ('gram', 'Gram'), ('basis', 'basis'), ('modes', 'modes'), ('work', 'work'), ('output', 'output')]
+
+
+#Spread nImages pairs over nBatches batches - the first batches get one more pair, so none are dropped
+def spread_batches(nImages, nBatches):
+    nBatches = max(1, min(nBatches, nImages))
+
+    return [nImages//nBatches + (1 if batch < nImages % nBatches else 0) for batch in range(nBatches)]
+
+#Number of pixels of a frame after cropping - cropList is [X1, X2, Y1, Y2] and is cut to the frame like a slice
+def crop_pixels(frameShape, cropList):
+    ny = len(range(frameShape[0])[cropList[2]:cropList[3]])
+    nx = len(range(frameShape[1])[cropList[0]:cropList[1]])
+
+    return nx * ny
+
+#Physical memory in bytes, None if we can't tell (there is no os.sysconf on Windows)
+def physical_memory():
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+#Filter of the settings - 'pod', a background or a frequency filter
+def filter_type(settings):
+    if 'frequencyFilter' in settings:
+        return settings['frequencyFilter']
+
+    return settings.get('background', 'pod')
+
+#Eigen solver the engine picks for a batch of n images (see PODEngine.temporal_basis)
+def eig_method(eigSolver, n, nKeep):
+    method = eigSolver
+    if method == 'auto':
+        if n <= 1000:
+            method = 'full'
+        elif n <= 4000:
+            method = 'subset'
+        else:
+            method = 'lanczos'
+
+    if method == 'lanczos' and nKeep >= n - 1:
+        method = 'subset'
+
+    return method
+
+#Predicted peak memory (bytes) of filtering a batch of nColumns image pairs of nPixels pixels, by part
+#The A and B frame sets are filtered at the same time. Memory mapped matrices (streaming or a scratch folder)
+#only cost the tiles in memory. The pipeline holds more batches only if they fit the budget it is given
+#(plan_batches returns the budget it used), so we plan for one
+def batch_memory(settings, nPixels, nColumns, sourceDtype):
+    if settings.get('dtype', 'float64') == 'auto':
+        dtype = auto_dtype(sourceDtype)
+    else:
+        dtype = np.dtype(settings.get('dtype', 'float64'))
+
+    filterType = filter_type(settings)
+    tilePixels = min(settings.get('tileSize', 4096), nPixels)
+    mapped = settings.get('streaming', False) or settings.get('scratchFolder', None) is not None
+
+    #Sliding backgrounds also decode the images of the window on each side
+    dataColumns = nColumns
+    if filterType in SLIDING_BACKGROUND_LIST:
+        dataColumns += 2*(settings.get('window', 21)//2)
+
+    memory = {'data': 0, 'gram': 0, 'basis': 0, 'modes': 0, 'work': 0, 'output': 0}
+
+    if mapped:
+        memory['data'] = 2 * tilePixels * dataColumns * 8
+    else:
+        memory['data'] = 2 * nPixels * dataColumns * dtype.itemsize
+
+    #Correlation matrices, their eigen decomposition and the projection on the kept modes
+    if filterType == 'pod' or (filterType in FREQUENCY_FILTER_LIST and settings.get('removeModes', False)):
+        nKeep = min(max(settings.get('keepModes', 5), settings.get('nModes', 1)), nColumns)
+        method = eig_method(settings.get('eigSolver', 'auto'), nColumns, nKeep)
+
+        memory['gram'] = 2 * nColumns**2 * 8
+
+        if method == 'svd':
+            memory['basis'] = 2 * 3 * nColumns**2 * 8
+        elif method == 'full':
+            memory['basis'] = 2 * 2 * nColumns**2 * 8
+        elif method == 'subset':
+            memory['basis'] = 2 * (nColumns**2 + nColumns * nKeep) * 8
+        else:
+            memory['basis'] = 2 * nColumns * max(2*nKeep + 1, 20) * 8
+
+        #The projection on the kept modes is only stored if the batch can be refiltered, otherwise it is done a tile at a time
+        if mapped or not settings.get('keepCoefficients', False):
+            memory['modes'] = 2 * tilePixels * nKeep * 8
+        else:
+            memory['modes'] = 2 * nPixels * nKeep * dtype.itemsize
+
+        #Float64 tiles of the correlation (and of the precision check if it is on)
+        if dtype != np.float64 or mapped:
+            memory['work'] = 2 * tilePixels * nColumns * 8
+        if dtype != np.float64 and settings.get('checkPrecision', False):
+            memory['work'] += 2 * tilePixels * nColumns * 8
+
+    #Running minimums from both sides, or the levels and histograms of the median, for a tile of pixels
+    if filterType in SLIDING_BACKGROUND_LIST:
+        nLevels = settings.get('medianLevels', 256)
+        backgroundPixels = min(nPixels, sliding_tile_pixels(filterType, dataColumns, nColumns, dtype.itemsize, nLevels))
+        memory['work'] = backgroundPixels * sliding_pixel_bytes(filterType, dataColumns, nColumns, dtype.itemsize, nLevels)
+
+    #The background of each frame set, the percentile keeps the frames of the exact percentile with the copy
+    #np.percentile sorts, or the five markers and their positions for every pixel made from them
+    elif filterType == 'percentile':
+        frameBytes = exact_percentile_images(nPixels, dtype.itemsize) * dtype.itemsize
+        memory['work'] = 2 * nPixels * (frameBytes + max(frameBytes, 10*8) + dtype.itemsize)
+    elif filterType in ['mean', 'min']:
+        memory['work'] = 2 * nPixels * (8 + dtype.itemsize)
+
+    #A tile, its spectrum and the transformed tile
+    if filterType in FREQUENCY_FILTER_LIST:
+        memory['work'] += 3 * min(TILE_BYTES, nPixels * nColumns * dtype.itemsize)
+
+    #Images are converted and saved a block at a time - two A and B blocks (one saved while the next is converted)
+    #and the block used for clipping
+    outputItemsize = output_dtype(sourceDtype, settings.get('outputDepth', 'source')).itemsize
+    blockColumns = max(1, min(settings.get('convertColumns', 16), nColumns))
+    memory['output'] = nPixels * blockColumns * (4 * outputItemsize + dtype.itemsize)
+
+    return memory
+
+#Plan the batches of nImages pairs - with nBatches the pairs are spread over that many batches, without it
+#we pick the fewest batches (so the largest) that fit the memory budget. The budget (bytes) is shared by the
+#batch workers, without one we plan for part of the physical memory
+#Returns the batch sizes, the memory of the largest batch by part, its total, the budget of a batch, if it fits
+#and the whole budget - the engine sizes its pipeline from it
+def plan_batches(settings, nPixels, nImages, sourceDtype, memoryBudget = None, nBatches = None):
+    if memoryBudget is None:
+        physicalMemory = physical_memory()
+        if physicalMemory is not None:
+            memoryBudget = physicalMemory * MEMORY_FRACTION
+
+    batchBudget = None
+    if memoryBudget is not None:
+        batchBudget = memoryBudget / max(1, settings.get('batchWorkers', 1))
+
+    def peak(nBatches):
+        return sum(batch_memory(settings, nPixels, -(-nImages // nBatches), sourceDtype).values())
+
+    if nBatches is None:
+        nBatches = 1
+
+        #The memory only grows with the batch size, so we search for the fewest batches that fit
+        if batchBudget is not None and peak(1) > batchBudget:
+            low, high = 1, max(1, nImages)
+            while low < high:
+                middle = (low + high)//2
+                if peak(middle) <= batchBudget:
+                    high = middle
+                else:
+                    low = middle + 1
+
+            nBatches = low
+
+    batchSizes = spread_batches(nImages, nBatches)
+    memory = batch_memory(settings, nPixels, max(batchSizes), sourceDtype)
+    peakBytes = sum(memory.values())
+
+    return {'batchSizes': batchSizes, 'memory': memory, 'peak': peakBytes, 'budget': batchBudget,
+            'fits': batchBudget is None or peakBytes <= batchBudget, 'memoryBudget': memoryBudget}
+
+#Size in bytes as text, in MB below a GB
+def format_bytes(nBytes):
+    if nBytes < 1024**3:
+        return '%.1f MB'%(nBytes / 1024**2)
+
+    return '%.2f GB'%(nBytes / 1024**3)
+
+#One line description of a plan, e.g. for the GUI and pod_cli.py
+def plan_summary(plan):
+    batchSizes = plan['batchSizes']
+    if min(batchSizes) == max(batchSizes):
+        sizes = '%i'%batchSizes[0]
+    else:
+        sizes = '%i-%i'%(min(batchSizes), max(batchSizes))
+
+    parts = ', '.join(['%s %s'%(label, format_bytes(plan['memory'][part])) for part, label in MEMORY_PARTS if plan['memory'][part] > 0])
+    summary = '%i batch%s of %s pairs, peak %s per batch (%s)'%(len(batchSizes), '' if len(batchSizes) == 1 else 'es', sizes, format_bytes(plan['peak']), parts)
+
+    if plan['budget'] is not None:
+        summary += ' of %s%s'%(format_bytes(plan['budget']), '' if plan['fits'] else ' - does not fit')
+
+    return summary
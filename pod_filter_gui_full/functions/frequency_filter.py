@@ -0,0 +1,47 @@
+#Temporal frequency filter - the time series of every pixel is transformed with a real FFT,
+#a band of frequencies (e.g. of periodic reflections) is removed and the series is transformed back
+#This module doesn't need Qt, so it can also be used by POD_Filter_Script.py
+
+import numpy as np
+import scipy.fft
+
+#'high-pass' removes the frequencies below the low cutoff (the mean too), 'band-stop' the ones between the cutoffs
+FREQUENCY_FILTER_LIST = ['high-pass', 'band-stop']
+
+#Size of the pixel tiles transformed at once, so we never hold the spectra of the whole matrix
+TILE_BYTES = 64*1024**2
+
+
+#Frequencies of the real FFT of nImages images that are removed by the filter
+def stop_band(nImages, filterType, lowCutoff, highCutoff = None, frameRate = 1.0):
+    frequencies = scipy.fft.rfftfreq(nImages, d = 1/frameRate)
+
+    if filterType == 'high-pass':
+        return frequencies < lowCutoff
+    elif filterType == 'band-stop':
+        low, high = sorted((lowCutoff, highCutoff))
+        return (frequencies >= low) & (frequencies <= high)
+
+    raise ValueError('unknown frequency filter %s'%filterType)
+
+#Filter the time series (rows) of D in place, the cutoffs are in the units of frameRate
+#Every tile of pixels is copied so its time series are contiguous, the FFTs of a tile run on workers threads
+def frequency_filter(D, filterType, lowCutoff, highCutoff = None, frameRate = 1.0, workers = -1, tileBytes = TILE_BYTES):
+    nImages = D.shape[1]
+    stop = stop_band(nImages, filterType, lowCutoff, highCutoff, frameRate)
+
+    if not stop.any():
+        return D
+
+    tilePixels = max(1, tileBytes // (nImages * D.dtype.itemsize))
+    for start in range(0, D.shape[0], tilePixels):
+        tile = np.ascontiguousarray(D[start:start + tilePixels])
+
+        spectrum = scipy.fft.rfft(tile, axis = 1, workers = workers, overwrite_x = True)
+        spectrum[:, stop] = 0
+        D[start:start + tilePixels] = scipy.fft.irfft(spectrum, n = nImages, axis = 1, workers = workers, overwrite_x = True)
+
+    if isinstance(D, np.memmap):
+        D.flush()
+
+    return D
@@ -0,0 +1,244 @@
+#Single container outputs for image sequences, so a run doesn't create tens of thousands of small files
+#Frames are stored by frame set ('a' or 'b') and index and can be read back in any order
+#   tiff   - one multi-page TIFF, every page is tagged with its frame
+#   hdf5   - one HDF5 file with an 'a' and 'b' dataset, chunked by frame (needs h5py)
+#   chunks - a folder of .npz files holding chunkFrames frames each (Zarr-like)
+
+from pathlib import Path
+from skimage.io import imread
+import numpy as np
+import tifffile
+import shutil
+import json
+
+#h5py is only needed for HDF5 output
+try:
+    import h5py
+except ImportError:
+    h5py = None
+
+#Name of the container in the save folder for every format ('files' is one TIFF per image)
+CONTAINER_NAMES = {'tiff': 'frames.tif', 'hdf5': 'frames.h5', 'chunks': 'frames.chunks'}
+
+
+def container_path(folder, containerFormat):
+    return Path(folder) / CONTAINER_NAMES[containerFormat]
+
+#Delete a container before a new run writes every frame again
+def remove_container(path):
+    if path.is_dir():
+        shutil.rmtree(path)
+    elif path.exists():
+        path.unlink()
+
+#Writer for a container format, frames written twice keep the last image
+#compress uses a fast lossless compression (zlib level 1, lzf for HDF5)
+def open_container_writer(folder, containerFormat, compress = False, chunkFrames = 16):
+    Path(folder).mkdir(parents = True, exist_ok = True)
+    path = container_path(folder, containerFormat)
+
+    if containerFormat == 'tiff':
+        return TiffContainerWriter(path, compress)
+    elif containerFormat == 'hdf5':
+        return HDF5ContainerWriter(path, compress)
+    elif containerFormat == 'chunks':
+        return ChunkContainerWriter(path, compress, chunkFrames)
+
+    raise ValueError('unknown container format %s'%containerFormat)
+
+#Reader for the output in a folder - a container if there is one, otherwise the A%04da.tif/A%04db.tif images
+#Returns None if there is no output
+def open_container(folder):
+    folder = Path(folder)
+
+    if (folder / CONTAINER_NAMES['tiff']).exists():
+        return TiffContainerReader(folder / CONTAINER_NAMES['tiff'])
+    elif (folder / CONTAINER_NAMES['hdf5']).exists():
+        return HDF5ContainerReader(folder / CONTAINER_NAMES['hdf5'])
+    elif (folder / CONTAINER_NAMES['chunks']).exists():
+        return ChunkContainerReader(folder / CONTAINER_NAMES['chunks'])
+    elif (folder / 'A0000a.tif').exists():
+        return ImageFolderReader(folder)
+
+    return None
+
+
+class TiffContainerWriter:
+    def __init__(self, path, compress):
+        #Appending lets a single batch be saved again, BigTIFF so we aren't limited to 4 GB
+        self.tiff = tifffile.TiffWriter(path, bigtiff = True, append = path.exists())
+
+        if compress:
+            self.compression = 'zlib'
+        else:
+            self.compression = None
+
+    def write(self, frameSet, index, image):
+        self.tiff.write(image, compression = self.compression, compressionargs = {'level': 1} if self.compression else None,
+                        description = '%s %i'%(frameSet, index), metadata = None)
+
+    def close(self):
+        self.tiff.close()
+
+
+class TiffContainerReader:
+    def __init__(self, path):
+        self.tiff = tifffile.TiffFile(path)
+
+        #Page of every frame, a frame written again points to the newest page
+        self.pages = {}
+        for pageNumber, page in enumerate(self.tiff.pages):
+            frameSet, index = page.description.split()
+            self.pages[(frameSet, int(index))] = pageNumber
+
+    def frame_count(self, frameSet):
+        return max([index + 1 for (pageSet, index) in self.pages if pageSet == frameSet], default = 0)
+
+    def read(self, frameSet, index):
+        return self.tiff.pages[self.pages[(frameSet, index)]].asarray()
+
+    def close(self):
+        self.tiff.close()
+
+
+class HDF5ContainerWriter:
+    def __init__(self, path, compress):
+        if h5py is None:
+            raise ImportError('h5py is needed for HDF5 output')
+
+        self.file = h5py.File(path, 'a')
+
+        if compress:
+            self.compression = 'lzf'
+        else:
+            self.compression = None
+
+    def write(self, frameSet, index, image):
+        #One chunk per frame, so any frame can be read on its own
+        if frameSet not in self.file:
+            self.file.create_dataset(frameSet, shape = (0,) + image.shape, maxshape = (None,) + image.shape,
+                                     dtype = image.dtype, chunks = (1,) + image.shape, compression = self.compression)
+
+        dataset = self.file[frameSet]
+        if index >= dataset.shape[0]:
+            dataset.resize(index + 1, axis = 0)
+
+        dataset[index] = image
+
+    def close(self):
+        self.file.close()
+
+
+class HDF5ContainerReader:
+    def __init__(self, path):
+        if h5py is None:
+            raise ImportError('h5py is needed to read HDF5 output')
+
+        self.file = h5py.File(path, 'r')
+
+    def frame_count(self, frameSet):
+        if frameSet not in self.file:
+            return 0
+
+        return self.file[frameSet].shape[0]
+
+    def read(self, frameSet, index):
+        return self.file[frameSet][index]
+
+    def close(self):
+        self.file.close()
+
+
+class ChunkContainerWriter:
+    #Frames index//chunkFrames of a frame set go to the same chunk file, a chunk is written once it is full
+    def __init__(self, path, compress, chunkFrames):
+        self.path = path
+        self.compress = compress
+
+        self.path.mkdir(exist_ok = True)
+
+        #Keep the chunk size of an existing container so we can add to it
+        metaPath = self.path / 'meta.json'
+        if metaPath.exists():
+            self.meta = json.loads(metaPath.read_text())
+        else:
+            self.meta = {'chunkFrames': chunkFrames, 'frames': {}}
+
+        self.chunkFrames = self.meta['chunkFrames']
+
+        #Frames of the chunks that aren't full yet - {(frameSet, chunk): {index: image}}
+        self.pending = {}
+
+    def write(self, frameSet, index, image):
+        chunk = index // self.chunkFrames
+        frames = self.pending.setdefault((frameSet, chunk), {})
+        frames[index] = np.copy(image)
+
+        self.meta['frames'][frameSet] = max(self.meta['frames'].get(frameSet, 0), index + 1)
+
+        if len(frames) == self.chunkFrames:
+            self.write_chunk(frameSet, chunk)
+
+    def write_chunk(self, frameSet, chunk):
+        frames = self.pending.pop((frameSet, chunk))
+        chunkPath = self.path / ('%s_%06i.npz'%(frameSet, chunk))
+
+        #Frames of this chunk that were saved before (a batch saved again) are kept
+        if chunkPath.exists():
+            with np.load(chunkPath) as saved:
+                for index, image in zip(saved['indices'], saved['frames']):
+                    frames.setdefault(int(index), image)
+
+        indices = sorted(frames)
+        if self.compress:
+            np.savez_compressed(chunkPath, indices = indices, frames = np.stack([frames[index] for index in indices]))
+        else:
+            np.savez(chunkPath, indices = indices, frames = np.stack([frames[index] for index in indices]))
+
+    def close(self):
+        for frameSet, chunk in list(self.pending):
+            self.write_chunk(frameSet, chunk)
+
+        (self.path / 'meta.json').write_text(json.dumps(self.meta))
+
+
+class ChunkContainerReader:
+    def __init__(self, path):
+        self.path = path
+        self.meta = json.loads((self.path / 'meta.json').read_text())
+        self.chunkFrames = self.meta['chunkFrames']
+
+        #Last chunk read, the preview usually reads neighbouring frames
+        self.chunkKey = None
+
+    def frame_count(self, frameSet):
+        return self.meta['frames'].get(frameSet, 0)
+
+    def read(self, frameSet, index):
+        chunkKey = (frameSet, index // self.chunkFrames)
+
+        if chunkKey != self.chunkKey:
+            with np.load(self.path / ('%s_%06i.npz'%chunkKey)) as saved:
+                self.indices = list(saved['indices'])
+                self.frames = saved['frames']
+            self.chunkKey = chunkKey
+
+        return self.frames[self.indices.index(index)]
+
+    def close(self):
+        self.chunkKey = None
+
+
+class ImageFolderReader:
+    #The default output, one TIFF per image
+    def __init__(self, folder):
+        self.folder = folder
+
+    def frame_count(self, frameSet):
+        return len(list(self.folder.glob('A*%s.tif'%frameSet)))
+
+    def read(self, frameSet, index):
+        return imread(self.folder / ('A%04d%s.tif'%(index, frameSet)))
+
+    def close(self):
+        pass
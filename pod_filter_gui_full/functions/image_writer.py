@@ -0,0 +1,71 @@
+#Asynchronous image writer shared by the image cutter and the POD runner
+#Images are encoded and saved by a pool of threads fed from a bounded queue, so the producer only
+#waits when it is more than queueSize images ahead of the disk
+
+from concurrent.futures import Future
+from skimage.io import imsave
+import threading
+import queue
+import time
+
+
+class ImageWriter:
+    def __init__(self, nWorkers = 4, queueSize = 64):
+        self.queue = queue.Queue(maxsize = queueSize)
+
+        #Throughput counters
+        self.lock = threading.Lock()
+        self.bytesWritten = 0
+        self.filesWritten = 0
+        self.startTime = time.perf_counter()
+
+        self.workers = [threading.Thread(target = self.worker, daemon = True) for _ in range(nWorkers)]
+        for worker in self.workers:
+            worker.start()
+
+    #Queue an image to be saved, returns a future holding the path (or the error for this file)
+    #The image must not be changed until its future is done
+    def submit(self, imagePath, image):
+        future = Future()
+        self.queue.put((future, imagePath, image))
+
+        return future
+
+    def worker(self):
+        while True:
+            item = self.queue.get()
+
+            if item is None:
+                return
+
+            future, imagePath, image = item
+            try:
+                imsave(imagePath, image, check_contrast = False)
+
+            except Exception as e:
+                future.set_exception(e)
+
+            else:
+                with self.lock:
+                    self.bytesWritten += image.nbytes
+                    self.filesWritten += 1
+
+                future.set_result(imagePath)
+
+    #Image data written per second (MB/s) since the writer was created
+    def throughput(self):
+        return self.bytesWritten / max(time.perf_counter() - self.startTime, 1e-9) / 1024**2
+
+    #Let the workers finish the queued images and stop them
+    def close(self):
+        for _ in self.workers:
+            self.queue.put(None)
+
+        for worker in self.workers:
+            worker.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,1440 @@
+#Engines of the image cutter and the POD filter - plain Python, so they run without Qt or a display
+#Progress is reported through callbacks, the QThread classes in pod_functions.py are adapters around them
+#and pod_cli.py runs them from the command line
+
+#This is for reading images
+from skimage.io import imread
+
+from pathlib import Path
+import numpy as np
+import multiprocessing
+import tempfile
+import threading
+import queue
+import time
+import os
+
+#Run the A and B frames at the same time, decode images and filter batches in parallel
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+
+#Limit the number of BLAS threads used by numpy/scipy
+from threadpoolctl import threadpool_limits
+
+#Symmetric eigensolvers that can compute only the leading eigenpairs
+from scipy.linalg import eigh
+from scipy.sparse.linalg import eigsh
+
+#On-disk cache of decoded image stacks
+from functions.stack_cache import StackCache, DEFAULT_CACHE_SIZE
+
+#Saves images with a pool of threads
+from functions.image_writer import ImageWriter
+
+#Single container outputs (multi-page TIFF, HDF5 or a chunk folder) instead of one file per image
+from functions.image_container import open_container_writer, container_path, remove_container
+
+#Manifests of the saved batches, to resume interrupted runs
+from functions.batch_manifest import settings_hash, write_manifest, remove_manifest, batch_complete
+
+#Progress of the frame loops, a few updates a second with the throughput and time left
+from functions.progress_reporter import ProgressReporter, PROGRESS_RATE
+
+#Times, bytes and peak memory of the stages of a run, logged next to the outputs
+from functions.stage_timer import StageTimer, RUN_LOG
+
+
+
+#Keep the top (a) or bottom (b) half of an image if both frames are in one image, then crop and flip it 
+def crop_frame(image, half, cropList, flipImage):
+    if half == 'a':
+        image = image[:image.shape[0]//2,:]
+    elif half == 'b':
+        image = image[image.shape[0]//2:,:]
+
+    #Create image crop
+    crop = image[cropList[2]:cropList[3], cropList[0]:cropList[1]]
+
+    #Flip the image if we want to (this is a view, nothing is copied yet)
+    if flipImage:
+        crop = np.fliplr(crop)
+
+    return crop
+
+#Read an image and crop a frame for each half, an image holding both frames is only decoded once
+#This is a plain function so it can also run in a process pool
+def read_cropped_frames(imagePath, halves, cropList, flipImage):
+    image = imread(imagePath)
+
+    return [crop_frame(image, half, cropList, flipImage) for half in halves]
+
+#Crop, flip and cast a frame straight into a contiguous column of a (Fortran order) data matrix in one pass
+#The column is viewed with the frame shape, so there are no reshaped or float copies of the frame
+def fill_frame(column, crop):
+    columnImage = column.view()
+
+    #Raises instead of silently writing to a copy if the column isn't contiguous
+    columnImage.shape = crop.shape
+
+    np.copyto(columnImage, crop, casting = 'unsafe')
+
+#Scale filtered images, clip them to the range of the output type and cast them into out
+#This is done a block of columns at a time through clipBuffer
+#Values below 0 are treated as zero and values above the maximum saturate (a plain cast wraps them around)
+def convert_to_output(D, out, clipBuffer, scale = 1.0):
+    blockColumns = clipBuffer.shape[1]
+
+    #Float outputs keep every value
+    if np.issubdtype(out.dtype, np.integer):
+        maxValue = np.iinfo(out.dtype).max
+    else:
+        maxValue = None
+
+    for start in range(0, D.shape[1], blockColumns):
+        block = D[:, start:start+blockColumns]
+        clipped = clipBuffer[:, :block.shape[1]]
+
+        if scale != 1.0:
+            np.multiply(block, scale, out = clipped)
+            block = clipped
+
+        if maxValue is not None:
+            np.clip(block, 0, maxValue, out = clipped)
+        else:
+            np.copyto(clipped, block)
+
+        np.copyto(out[:, start:start+block.shape[1]], clipped, casting = 'unsafe')
+
+    #The buffers can be larger than D (e.g. the last block of a batch)
+    return out[:, :D.shape[1]]
+
+#Blocks of blockColumns images of converted A and B images - the first column of the block and the blocks
+def column_blocks(imagesA, imagesB, blockColumns):
+    for start in range(0, imagesA.shape[1], blockColumns):
+        yield start, imagesA[:, start:start + blockColumns], imagesB[:, start:start + blockColumns]
+
+#Precision of the data matrices for 'auto' - float32 holds 8 and 16 bit images exactly
+def auto_dtype(sourceDtype):
+    if np.issubdtype(sourceDtype, np.integer) and sourceDtype.itemsize <= 2:
+        return np.dtype('float32')
+
+    return np.dtype('float64')
+
+#Type of the saved images - 'source' keeps the bit depth of the images (float images are saved as float32)
+def output_dtype(sourceDtype, outputDepth):
+    if outputDepth != 'source':
+        return np.dtype(outputDepth)
+
+    if np.issubdtype(sourceDtype, np.integer):
+        return np.dtype(sourceDtype)
+
+    return np.dtype('float32')
+
+#Factor from the source range to the output range, 'rescale' maps the full integer ranges onto each other
+#(e.g. 16 bit to 8 bit divides by 256), 'clip' keeps the values and saturates them
+def output_scale(sourceDtype, outputDtype, outputScaling):
+    if outputScaling != 'rescale' or not np.issubdtype(sourceDtype, np.integer) or not np.issubdtype(outputDtype, np.integer):
+        return 1.0
+
+    return (np.iinfo(outputDtype).max + 1) / (np.iinfo(sourceDtype).max + 1)
+
+#Decode the frames of an image in a worker process, one for each half (and data matrix)
+#If a data matrix is a file we write the column straight into it, otherwise the frame is sent back
+#Returns the frames that were sent back, None for those that were written
+def decode_frame_process(imagePath, halves, cropList, flipImage, matrixPaths, dtype, shape, column):
+    crops = read_cropped_frames(imagePath, halves, cropList, flipImage)
+
+    for ii, matrixPath in enumerate(matrixPaths):
+        if matrixPath is None:
+            continue
+
+        #Columns of the mapped matrix are contiguous, so we only map the one we need
+        columnOffset = column * shape[0] * np.dtype(dtype).itemsize
+        columnMap = np.memmap(matrixPath, dtype = dtype, mode = 'r+', offset = columnOffset, shape = (shape[0],))
+        fill_frame(columnMap, crops[ii])
+        columnMap.flush()
+
+        crops[ii] = None
+
+    return crops
+
+#Decode, filter and save one batch in a worker process of the batch pool
+#The engine is rebuilt from its settings and the state of the engine that started the pool (image shape, types, bases...)
+#and progress goes back through progressQueue. Only the main process writes a container, so for those
+#the converted images are handed over in files. Returns the temporal basis of the batch and these files
+def filter_batch_process(engineClass, imageList, settings, state, batch, progressQueue):
+    #Every worker needs its own scratch files
+    if settings.get('scratchFolder', None) is not None:
+        settings = dict(settings, scratchFolder = Path(settings['scratchFolder']) / ('worker_%i'%os.getpid()))
+
+    engine = engineClass(imageList, Path(), settings, progress = lambda percent, label: progressQueue.put((percent, label)))
+    for name, value in state.items():
+        setattr(engine, name, value)
+
+    with threadpool_limits(limits = 2 * engine.blasThreads):
+        with engine.create_decode_executor():
+            matrices = engine.decode_batch(batch)
+
+        D_a_filt, D_b_filt = engine.timed_compute(batch, 0, matrices)
+
+        if engine.outputFormat == 'files':
+            engine.write_batch(batch, D_a_filt, D_b_filt)
+            imageFiles = None
+        else:
+            imageFiles = engine.export_batch(batch, D_a_filt, D_b_filt)
+
+    return engine.bases.get(batch, None), imageFiles
+
+
+#Callback used when we aren't told about progress
+def ignore_progress(*args):
+    pass
+
+
+class ImageCutterEngine:
+    #progress(percent, label) reports the progress, saved(success) is called when the images are saved
+    def __init__(self, imageList, saveFolder, settings, progress = ignore_progress, saved = ignore_progress):
+        self.progress = progress
+        self.saved = saved
+
+        #We need to know our save folder and the list of our image paths
+        self.imageList = imageList 
+
+        #Crop images before saving 
+        self.saveCrop = settings['saveCrop'] 
+        self.cropList = settings['cropList']
+
+        #Default save folder
+        self.saveFolder = saveFolder / 'cut'
+
+        #Number of threads encoding and saving images
+        self.writeWorkers = settings.get('writeWorkers', 4)
+
+        #'files' saves one TIFF per image, 'tiff', 'hdf5' or 'chunks' save one container
+        self.outputFormat = settings.get('outputFormat', 'files')
+        self.compressOutput = settings.get('compressOutput', False)
+
+        #Create function object
+        self.function = 'cut'
+
+        #Progress updates per second
+        self.progressRate = settings.get('progressRate', PROGRESS_RATE)
+
+        #Stage times of the run, logged in the save folder
+        self.stageTimer = StageTimer()
+
+    def progress_reporter(self, total, itemBytes = 0, unit = 'frames'):
+        return ProgressReporter(self.progress, total, itemBytes, self.progressRate, unit)
+
+    #Time a stage, the records go to the run log in the save folder
+    def stage(self, name, batch = None, nBytes = 0):
+        self.stageTimer.logPath = self.saveFolder / RUN_LOG
+        return self.stageTimer.stage(name, batch, nBytes)
+
+    #Log a stage timed in a loop
+    def log_stage(self, name, seconds, nBytes = 0, batch = None):
+        self.stageTimer.logPath = self.saveFolder / RUN_LOG
+        return self.stageTimer.add(name, seconds, nBytes, batch)
+
+    #One line summary of the stages of the run
+    def stage_summary(self):
+        return self.stageTimer.summary()
+
+    def save_images(self):
+        #Make the folder if it doesn't exist
+        self.saveFolder.mkdir(exist_ok = True)
+
+        #Images (or files) that could not be read or saved and why
+        failed = []
+
+        if self.outputFormat != 'files':
+            self.save_container(failed)
+            return
+
+        #The images are saved by the writer threads while we read the next ones
+        futures = {}
+        bytesRead = 0
+        readTime = 0.0
+        reporter = self.progress_reporter(len(self.imageList), unit = 'pairs')
+
+        #Reading overlaps with the writer threads, so the cut stage is the whole loop and reading is also timed on its own
+        with self.stage('cut') as stageRecord:
+            with ImageWriter(self.writeWorkers) as writer:
+                for ii, image in enumerate(self.imageList): 
+                    try:
+                        readStart = time.perf_counter()
+                        imageArray = imread(image)
+                        readTime += time.perf_counter() - readStart
+                    except Exception as e:
+                        failed.append((image, e))
+                        continue
+
+                    imageShape = imageArray.shape[0]
+
+                    #Create image names for each pair
+                    imageNameA = self.saveFolder / ('A%04da.tif'%ii)
+                    imageNameB = self.saveFolder / ('A%04db.tif'%ii)
+                
+                    imageA = imageArray[:imageShape//2, :]
+                    imageB = imageArray[imageShape//2:, :]
+
+                    if self.saveCrop:
+
+                        imageA = imageA[self.cropList[2]:self.cropList[3], self.cropList[0]:self.cropList[1]]
+                        imageB = imageB[self.cropList[2]:self.cropList[3], self.cropList[0]:self.cropList[1]]
+
+                    #Save the image pairs
+                    futures[writer.submit(imageNameA, imageA)] = imageNameA
+                    futures[writer.submit(imageNameB, imageB)] = imageNameB
+
+                    bytesRead += imageArray.nbytes
+                    reporter.update(ii + 1, 'Saving Image Pair %i of %i', ii + 1, len(self.imageList), nBytes = bytesRead)
+
+            stageRecord['bytes'] = writer.bytesWritten
+
+        self.log_stage('read', readTime, bytesRead)
+
+        #The writer is closed, so every image is saved (or failed)
+        for future, imageName in futures.items():
+            if future.exception() is not None:
+                failed.append((imageName, future.exception()))
+
+        if len(failed) > 0:
+            self.progress(0, 'Failed saving %i images (%s: %s)'%(len(failed), failed[0][0].name, failed[0][1]))
+            self.saved(False)
+            return
+
+        self.progress(100, 'Finished (%.0f MB/s)'%writer.throughput())
+        self.saved(True)
+
+    #Save the image pairs in a single container, frames are written in order
+    def save_container(self, failed):
+        containerPath = container_path(self.saveFolder, self.outputFormat)
+
+        try:
+            remove_container(containerPath)
+            container = open_container_writer(self.saveFolder, self.outputFormat, self.compressOutput)
+        except Exception as e:
+            self.progress(0, 'Failed creating %s: %s'%(containerPath.name, e))
+            self.saved(False)
+            return
+
+        startTime = time.perf_counter()
+        bytesWritten = 0
+        bytesRead = 0
+        readTime = 0.0
+        writeTime = 0.0
+        reporter = self.progress_reporter(len(self.imageList), unit = 'pairs')
+
+        for ii, image in enumerate(self.imageList): 
+            try:
+                readStart = time.perf_counter()
+                imageArray = imread(image)
+                readTime += time.perf_counter() - readStart
+                bytesRead += imageArray.nbytes
+
+                imageShape = imageArray.shape[0]
+
+                imageA = imageArray[:imageShape//2, :]
+                imageB = imageArray[imageShape//2:, :]
+
+                if self.saveCrop:
+                    imageA = imageA[self.cropList[2]:self.cropList[3], self.cropList[0]:self.cropList[1]]
+                    imageB = imageB[self.cropList[2]:self.cropList[3], self.cropList[0]:self.cropList[1]]
+
+                writeStart = time.perf_counter()
+                container.write('a', ii, imageA)
+                container.write('b', ii, imageB)
+                writeTime += time.perf_counter() - writeStart
+                bytesWritten += imageA.nbytes + imageB.nbytes
+
+            except Exception as e:
+                failed.append((image, e))
+
+            reporter.update(ii + 1, 'Saving Image Pair %i of %i', ii + 1, len(self.imageList), nBytes = bytesWritten)
+
+        writeStart = time.perf_counter()
+        container.close()
+        writeTime += time.perf_counter() - writeStart
+
+        #The frames are read and written in turn, so both are timed in the loop
+        self.log_stage('read', readTime, bytesRead)
+        self.log_stage('write', writeTime, bytesWritten)
+
+        if len(failed) > 0:
+            self.progress(0, 'Failed saving %i images (%s: %s)'%(len(failed), failed[0][0].name, failed[0][1]))
+            self.saved(False)
+            return
+
+        self.progress(100, 'Finished (%.0f MB/s)'%(bytesWritten / max(time.perf_counter() - startTime, 1e-9) / 1024**2))
+        self.saved(True)
+
+
+
+class PODEngine:
+    #progress(percent, label) reports the progress, computed(success) is called when a batch is filtered 
+    #and saved(success) when a batch is saved
+    def __init__(self, imageList, saveFolder, settings, progress = ignore_progress, computed = ignore_progress, saved = ignore_progress):
+        self.progress = progress
+        self.computed = computed
+        self.saved = saved
+
+        #Worker processes of the batch pool are created from the same settings
+        self.settings = settings
+
+        self.cutImages = settings['cutImages']
+
+        #We need to know our save folder and the list of our image paths
+        self.imageList = imageList 
+
+        self.saveFolder = saveFolder / 'pod_output'
+
+        #Make the folder if it doesn't exist
+
+        if not self.cutImages:
+            #Split the list into a and b 
+            self.imageAList = []
+            self.imageBList = []
+
+            for image in self.imageList:
+                if image.name[-5] == 'a':
+                    self.imageAList.append(image)
+                elif image.name[-5] == 'b':
+                    self.imageBList.append(image) 
+
+        #Grab information from settings dictionary
+        # Number of modes to remove. If 0, the filter is not active!
+        self.nModes = settings['nModes']
+        self.flipImage = settings['flipImage']
+        
+        #Pairs in every batch - batchSizes spreads the pairs so none are dropped, otherwise every batch has nPairs
+        #nPairs is the largest batch, the buffers are sized for it
+        self.batchSizes = list(settings.get('batchSizes', [settings['nPairs']] * settings['nBatches']))
+        self.batchStarts = [int(start) for start in np.cumsum([0] + self.batchSizes)]
+        self.nPairs = max(self.batchSizes)
+        
+        #Batches to Run
+        self.nBatches = len(self.batchSizes)
+
+        #Crop list - [X1, X2, Y1, Y2]
+        self.cropList = settings['cropList'] 
+
+        #This variable changes if we want to save/compute the filtered matrix
+        self.function = 'compute_matrix'
+
+        #Number of pixel rows processed at once when removing modes
+        self.tileSize = settings.get('tileSize', 4096)
+
+        #Eigen solver for the temporal basis - 'svd' or a symmetric eigh ('auto', 'full', 'subset', 'lanczos')
+        self.eigSolver = settings.get('eigSolver', 'auto')
+
+        #Also compute every eigenvalue of the correlation matrices (not only the removed ones)
+        self.fullSpectrum = settings.get('fullSpectrum', False)
+
+        #Precision of the data and filtered matrices - float32 halves the memory, 'auto' picks it from the images
+        #The correlation matrices are always accumulated in float64
+        self.dtypeSetting = settings.get('dtype', 'float64')
+        if self.dtypeSetting == 'auto':
+            self.dtype = np.dtype('float64')
+        else:
+            self.dtype = np.dtype(self.dtypeSetting)
+
+        #Compare float32 results with a float64 computation (a second projection of every tile), off by default
+        self.checkPrecision = settings.get('checkPrecision', False)
+        self.maxDeviation = None
+
+        #Bit depth of the saved images ('source', 'uint8' or 'uint16') and if they are clipped or rescaled to it
+        self.outputDepth = settings.get('outputDepth', 'source')
+        self.outputScaling = settings.get('outputScaling', 'clip')
+
+        #Out-of-core mode - the data matrices are spilled to disk and only processed in tiles 
+        #so the memory needed is about nPairs^2 + tileSize*nPairs instead of pixels*nPairs
+        self.streaming = settings.get('streaming', False)
+
+        #Folder for memory mapped data matrices - None keeps them in RAM 
+        #The files are kept so they can be reused by write_batch and the next batch
+        self.scratchFolder = settings.get('scratchFolder', None)
+        if self.scratchFolder is not None:
+            self.scratchFolder = Path(self.scratchFolder)
+
+        #Number of threads encoding and saving images
+        self.writeWorkers = settings.get('writeWorkers', 4)
+
+        #'files' saves one TIFF per image, 'tiff', 'hdf5' or 'chunks' save one container for the run
+        #The container stays open while the batches are written
+        self.outputFormat = settings.get('outputFormat', 'files')
+        self.compressOutput = settings.get('compressOutput', False)
+        self.container = None
+
+        #Number of workers decoding images, and if they are threads or processes (for codecs that hold the GIL)
+        self.decodeWorkers = settings.get('decodeWorkers', min(8, os.cpu_count() or 1))
+        self.decodeBackend = settings.get('decodeBackend', 'thread')
+
+        #BLAS threads for each of the A and B tasks - by default they share the cores equally
+        self.blasThreads = settings.get('blasThreads', max(1, (os.cpu_count() or 2)//2))
+
+        #RAM (in bytes) we can use for batches in flight when pipelining - None holds one batch in memory at a time
+        self.memoryBudget = settings.get('memoryBudget', None)
+
+        #Processes filtering whole batches at the same time, 1 runs the batches one at a time in the pipeline
+        self.batchWorkers = settings.get('batchWorkers', 1)
+
+        #Skip the batches already saved with the same settings (only for one file per image)
+        self.resume = settings.get('resume', False)
+
+        #Decode, compute and write times of every batch, for its manifest - {batch: {stage: seconds}}
+        self.batchTimes = {}
+
+        #Stage times of the run, logged in the save folder - batch workers are given the id of the run
+        self.stageTimer = StageTimer(runId = settings.get('runId', None))
+
+        #Batch being computed, for the stages of the A and B frame sets
+        self.computingBatch = None
+
+        #Progress updates per second of the frame loops
+        self.progressRate = settings.get('progressRate', PROGRESS_RATE)
+
+        #Number of leading modes whose temporal basis we keep, so nModes can be changed without recomputing
+        self.keepModes = max(settings.get('keepModes', 5), self.nModes)
+
+        #The projection on the kept modes is only stored for the batch left in memory, when something (the GUI)
+        #wants to refilter it - coefficientBatch is that batch, the other batches only keep their basis
+        self.keepCoefficients = settings.get('keepCoefficients', False)
+        self.coefficientBatch = None
+        self.modeCoefficients = None
+
+        #Temporal basis and eigenvalues of every computed batch - {batch: {'a': (Psi, Lambda), 'b': (Psi, Lambda)}}
+        self.bases = {}
+
+        #Batch (and scratch slot) of the filtered matrices in memory
+        self.residentBatch = None
+        self.residentSlot = 0
+
+        #Output images are converted and saved convertColumns images at a time, so only a few blocks
+        #of images are held on top of the filtered matrices
+        self.convertColumns = settings.get('convertColumns', 16)
+
+        #Cache of decoded stacks so repeated runs on the same images skip decoding - None disables it
+        self.stackCache = None
+        if settings.get('cacheFolder', None) is not None:
+            self.stackCache = StackCache(settings['cacheFolder'], settings.get('cacheSize', DEFAULT_CACHE_SIZE))
+        
+    #Run the remaining batches as a three stage pipeline: batch i+1 is decoded and batch i-1 is written
+    #while batch i is computed. The number of batches held at once is limited by the memory budget 
+    #Batches we already have a temporal basis for are only decoded and filtered
+    def continue_batches(self):
+        remainingBatches = self.pending_batches()
+        if len(remainingBatches) < self.nBatches:
+            self.progress(0, 'Resuming - %i of %i batches already saved'%(self.nBatches - len(remainingBatches), self.nBatches))
+
+        if self.batchWorkers > 1:
+            self.pool_batches(remainingBatches)
+            return
+
+        ny, nx = self.imageShape
+
+        #Each batch in flight holds an A and a B matrix, memory mapped ones only cost disk
+        batchBytes = 2 * nx * ny * self.batch_columns() * self.dtype.itemsize
+        if self.scratchFolder is not None or self.streaming:
+            nSlots = 3
+        elif self.memoryBudget is None:
+            nSlots = 1
+        else:
+            nSlots = max(1, min(3, int(self.memoryBudget // batchBytes)))
+
+        self.pipelineSlots = threading.Semaphore(nSlots)
+        self.blockedTime = {'decode': 0.0, 'compute': 0.0, 'write': 0.0}
+        self.writeError = None
+        self.computeError = None
+
+        #The batch in memory (batch 0 after Compute) only needs writing
+        pendingBatches = [batch for batch in remainingBatches if batch != self.residentBatch]
+
+        #The last batch filtered stays in memory
+        if len(pendingBatches) > 0:
+            self.coefficientBatch = pendingBatches[-1]
+
+        #Every batch is written again, so we start a new container
+        if self.outputFormat != 'files':
+            remove_container(container_path(self.saveFolder, self.outputFormat))
+
+        decodedQueue = queue.Queue()
+        filteredQueue = queue.Queue()
+        if self.residentBatch in remainingBatches:
+            self.pipelineSlots.acquire()
+            filteredQueue.put((self.residentBatch, self.D_a_filt, self.D_b_filt))
+
+        #The compute stage changes residentSlot, so the decoder counts from the slot we start with
+        decoder = threading.Thread(target = self.decode_stage, args = (decodedQueue, pendingBatches, nSlots, self.residentSlot), daemon = True)
+        writer = threading.Thread(target = self.write_stage, args = (filteredQueue,), daemon = True)
+
+        with self.create_decode_executor():
+            decoder.start()
+            writer.start()
+
+            try:
+                for _ in pendingBatches:
+                    #There is no point filtering batches that can't be saved
+                    if self.writeError is not None:
+                        break
+
+                    #Wait for the decoder
+                    startTime = time.perf_counter()
+                    item = decodedQueue.get()
+                    self.blockedTime['compute'] += time.perf_counter() - startTime
+
+                    #The decoder stopped because saving failed
+                    if item is None:
+                        break
+
+                    batch, slot, matrices = item
+
+                    if isinstance(matrices, Exception):
+                        raise matrices
+
+                    D_a_filt, D_b_filt = self.timed_compute(batch, slot, matrices)
+                    self.computed(True)
+
+                    filteredQueue.put((batch, D_a_filt, D_b_filt))
+
+            except Exception as e:
+                #The batch that failed never gets to the writer, so we release its buffer here
+                self.computeError = e
+                self.pipelineSlots.release()
+
+            finally:
+                #Let the writer finish the batches it has, the decoder stops at its next batch
+                filteredQueue.put(None)
+                writer.join()
+                decoder.join()
+                self.close_container()
+
+        if self.computeError is not None:
+            self.progress(0, 'Failed filtering batches: %s'%self.computeError)
+            self.saved(False)
+            return
+
+        if self.writeError is not None:
+            self.progress(0, 'Failed saving images: %s'%self.writeError)
+            self.saved(False)
+            return
+
+        self.progress(100, 'Finished - time blocked: decode %.1f s, compute %.1f s, write %.1f s'%(self.blockedTime['decode'], self.blockedTime['compute'], self.blockedTime['write']))
+
+    #Run the remaining batches in a pool of worker processes, each decodes, filters and saves whole batches
+    #Every batch has its own temporal basis, so they don't depend on each other. The batch in memory is saved here
+    def pool_batches(self, remainingBatches):
+        pendingBatches = [batch for batch in remainingBatches if batch != self.residentBatch]
+        nWorkers = max(1, min(self.batchWorkers, len(pendingBatches)))
+        workerSettings = self.worker_settings(nWorkers)
+
+        #Every batch is written again, so we start a new container
+        if self.outputFormat != 'files':
+            remove_container(container_path(self.saveFolder, self.outputFormat))
+
+        failure = None
+        batchesDone = 0
+
+        #Spawned workers don't inherit the threads and Qt state of this process
+        context = multiprocessing.get_context('spawn')
+        with context.Manager() as manager, ProcessPoolExecutor(max_workers = nWorkers, mp_context = context) as executor:
+            progressQueue = manager.Queue()
+
+            futures = {}
+            for batch in pendingBatches:
+                future = executor.submit(filter_batch_process, self.engine_class(), self.imageList, workerSettings, self.worker_state(batch), batch, progressQueue)
+                futures[future] = batch
+
+            try:
+                if self.residentBatch in remainingBatches:
+                    self.write_batch(self.residentBatch, self.D_a_filt, self.D_b_filt)
+
+                remaining = set(futures)
+                while len(remaining) > 0:
+                    done, remaining = wait(remaining, timeout = 0.1, return_when = FIRST_COMPLETED)
+                    self.forward_progress(progressQueue)
+
+                    for future in done:
+                        batch = futures[future]
+                        basis, imageFiles = future.result()
+
+                        if basis is not None:
+                            self.bases[batch] = basis
+
+                        if imageFiles is not None:
+                            self.write_exported_batch(batch, imageFiles)
+
+                        batchesDone += 1
+                        self.progress(batchesDone/len(pendingBatches)*100, '[Batch %i of %i] Finished in a worker (%i of %i batches done)'%(batch+1, self.nBatches, batchesDone, len(pendingBatches)))
+
+            except Exception as e:
+                failure = e
+                for future in futures:
+                    future.cancel()
+
+            finally:
+                self.close_container()
+
+        if failure is not None:
+            self.progress(0, 'Failed filtering batches: %s'%failure)
+            self.saved(False)
+            return
+
+        self.progress(100, 'Finished - %i batches in %i worker processes'%(len(pendingBatches), nWorkers))
+        self.saved(True)
+
+    #Batches still to be saved - when resuming, the batches with a complete manifest for these settings are skipped
+    #A container is always written again as a whole, so only runs saving one file per image can resume
+    def pending_batches(self):
+        allBatches = list(range(self.nBatches))
+        if not self.resume or self.outputFormat != 'files':
+            return allBatches
+
+        settingsHash = self.settings_hash()
+        return [batch for batch in allBatches if not batch_complete(self.saveFolder, batch, settingsHash)]
+
+    #Hash of the filter, its settings and the images, a saved batch is reused only if it matches
+    #nModes can be changed after the settings are given, so we use the current value
+    def settings_hash(self):
+        settings = dict(self.settings, nModes = self.nModes)
+
+        return settings_hash(self.engine_class().__name__, settings, self.imageList)
+
+    #Stage times of a batch for its manifest
+    def batch_timings(self, batch):
+        return self.batchTimes.setdefault(batch, {})
+
+    #Filter a batch and keep the time it took
+    def timed_compute(self, batch, slot, matrices):
+        startTime = time.perf_counter()
+        self.computingBatch = batch
+        filtered = self.compute_batch(batch, slot, matrices)
+        self.batch_timings(batch)['compute'] = time.perf_counter() - startTime
+
+        return filtered
+
+    #Time a stage of a batch, the records go to the run log in the save folder
+    def stage(self, name, batch = None, nBytes = 0):
+        self.stageTimer.logPath = self.saveFolder / RUN_LOG
+        return self.stageTimer.stage(name, batch, nBytes)
+
+    #Log a stage timed in a loop
+    def log_stage(self, name, seconds, nBytes = 0, batch = None):
+        self.stageTimer.logPath = self.saveFolder / RUN_LOG
+        return self.stageTimer.add(name, seconds, nBytes, batch)
+
+    #One line summary of the stages of the run so far, with those of the batch workers
+    def stage_summary(self):
+        return self.stageTimer.summary()
+
+    def progress_reporter(self, total, itemBytes = 0, unit = 'frames'):
+        return ProgressReporter(self.progress, total, itemBytes, self.progressRate, unit)
+
+    #Class the batch workers rebuild, the Qt adapters give the engine they run
+    def engine_class(self):
+        return type(self)
+
+    #Settings of the batch workers - the threads and the memory budget of this engine are shared between them
+    def worker_settings(self, nWorkers):
+        settings = dict(self.settings)
+        settings['batchWorkers'] = 1
+        settings['blasThreads'] = max(1, self.blasThreads // nWorkers)
+        settings['decodeWorkers'] = max(1, self.decodeWorkers // nWorkers)
+        settings['writeWorkers'] = max(1, self.writeWorkers // nWorkers)
+        settings['fftWorkers'] = max(1, (os.cpu_count() or 1) // nWorkers)
+
+        #Together the workers report as often as this engine
+        settings['progressRate'] = self.progressRate / nWorkers
+
+        #The workers log their stages as part of this run
+        settings['runId'] = self.stageTimer.runId
+
+        #Nothing refilters the batches of the workers
+        settings['keepCoefficients'] = False
+
+        #A batch that doesn't fit in the part of a worker is processed out-of-core
+        if self.memoryBudget is not None:
+            settings['memoryBudget'] = self.memoryBudget / nWorkers
+
+            ny, nx = self.imageShape
+            batchBytes = 2 * nx * ny * self.batch_columns() * self.dtype.itemsize
+            if batchBytes > settings['memoryBudget'] and self.scratchFolder is None:
+                settings['streaming'] = True
+
+        return settings
+
+    #What a worker needs on top of the settings to filter a batch like this engine (set by prepare_images and the GUI)
+    def worker_state(self, batch):
+        state = {'imageShape': self.imageShape, 'sourceDtype': self.sourceDtype, 'dtype': self.dtype,
+                 'outputDtype': self.outputDtype, 'outputScale': self.outputScale,
+                 'nModes': self.nModes, 'saveFolder': self.saveFolder}
+
+        #Batches we have a temporal basis for are only filtered
+        if batch in self.bases:
+            state['bases'] = {batch: self.bases[batch]}
+
+        return state
+
+    #Pass on the progress messages of the batch workers
+    def forward_progress(self, progressQueue):
+        while True:
+            try:
+                percent, label = progressQueue.get_nowait()
+            except queue.Empty:
+                return
+
+            self.progress(percent, label)
+
+    #Decoding stage of the pipeline (runs in its own thread)
+    #Scratch slots are used in turn after the one in memory, batches are written in order so a slot is free when reused
+    def decode_stage(self, decodedQueue, pendingBatches, nSlots, firstSlot):
+        for ii, batch in enumerate(pendingBatches):
+            #Wait for a free batch buffer, unless the other stages failed
+            startTime = time.perf_counter()
+            while not self.pipelineSlots.acquire(timeout = 0.1):
+                if self.computeError is not None or self.writeError is not None:
+                    decodedQueue.put(None)
+                    return
+            self.blockedTime['decode'] += time.perf_counter() - startTime
+
+            #The compute stage may be waiting for this batch, so it is told we stopped
+            if self.computeError is not None or self.writeError is not None:
+                self.pipelineSlots.release()
+                decodedQueue.put(None)
+                return
+
+            slot = (firstSlot + 1 + ii) % nSlots
+
+            try:
+                decodedQueue.put((batch, slot, self.decode_batch(batch, slot)))
+            except Exception as e:
+                decodedQueue.put((batch, slot, e))
+                return
+
+    #Writing stage of the pipeline (runs in its own thread)
+    def write_stage(self, filteredQueue):
+        while True:
+            #Wait for the compute stage
+            startTime = time.perf_counter()
+            item = filteredQueue.get()
+            self.blockedTime['write'] += time.perf_counter() - startTime
+
+            if item is None:
+                return
+
+            #After a failure we only release the buffers so the other stages can finish
+            batch, D_a_filt, D_b_filt = item
+            if self.writeError is None:
+                try:
+                    self.write_batch(batch, D_a_filt, D_b_filt)
+                except Exception as e:
+                    self.writeError = e
+
+            #This batch buffer can be reused 
+            self.pipelineSlots.release()
+
+    #Filter the first batch, failures (e.g. an image that can't be read) are reported with computed(False)
+    def pod_batch(self, batch):
+        try:
+            if not self.prepare_images():
+                return
+
+            with self.create_decode_executor():
+                self.prepare_filter()
+                matrices = self.decode_batch(batch)
+
+            self.coefficientBatch = batch
+            self.timed_compute(batch, 0, matrices)
+
+        except Exception as e:
+            self.progress(0, '[Batch %i of %i] Failed: %s'%(batch+1, self.nBatches, e))
+            self.computed(False)
+            return
+
+        self.computed(True)
+
+    #Work the filter needs before the first batch, done with the decoding workers (e.g. a background over every image)
+    def prepare_filter(self):
+        pass
+
+    #Find the image shape and the types of the matrices and saved images from the first image
+    #Returns False (and reports it) if there are no image pairs
+    def prepare_images(self):
+        #Prepare image matrix and calculate shape
+        imInitial = imread(self.imageList[0])
+
+        if self.cutImages:
+            imInitial = imInitial[:imInitial.shape[0]//2, :]
+
+        #Create image crop
+        croppedImage = imInitial[self.cropList[2]:self.cropList[3], self.cropList[0]:self.cropList[1]]
+
+        #Flip the image if we want to 
+        if self.flipImage:
+            croppedImage = np.fliplr(croppedImage)
+
+        #Get the shape of the image
+        self.imageShape = croppedImage.shape
+
+        #Types of the data matrices and the saved images follow the images we read
+        self.sourceDtype = imInitial.dtype
+        if self.dtypeSetting == 'auto':
+            self.dtype = auto_dtype(self.sourceDtype)
+
+        self.outputDtype = output_dtype(self.sourceDtype, self.outputDepth)
+        self.outputScale = output_scale(self.sourceDtype, self.outputDtype, self.outputScaling)
+
+        if not self.cutImages and len(self.imageAList)==0:
+            self.progress(0, 'Failed, could not find image pairs in folder')
+            self.computed(False)
+            return False
+
+        #Update progress
+        self.progress(0, 'Start Processing')
+        return True
+
+    #Pool of workers decoding images - both frame sets share it
+    #Decoding processes are spawned like the batch workers, forking copies the threads and Qt state of this process
+    def create_decode_executor(self):
+        if self.decodeBackend == 'process':
+            self.decodeExecutor = ProcessPoolExecutor(max_workers = self.decodeWorkers, mp_context = multiprocessing.get_context('spawn'))
+        else:
+            self.decodeExecutor = ThreadPoolExecutor(max_workers = self.decodeWorkers)
+
+        return self.decodeExecutor
+
+    #Decode the A and B images of a batch into new data matrices
+    #The slot number names the scratch files, so batches in flight at the same time don't share them
+    def decode_batch(self, batch, slot = 0):
+        return self.decode_images(batch, slot, self.batch_images(batch))
+
+    #Image numbers of the pairs of a batch
+    def batch_images(self, batch):
+        return range(self.batchStarts[batch], self.batchStarts[batch+1])
+
+    #Number of images in the matrices of the largest batch
+    def batch_columns(self):
+        return self.nPairs
+
+    #Decode the images imageNumbers of the A and B frames into the matrices of a slot, column k holds imageNumbers[k]
+    def decode_images(self, batch, slot, imageNumbers):
+        ny, nx = self.imageShape 
+        nImages = len(imageNumbers)
+        decodeStart = time.perf_counter()
+
+        #Bytes of the data matrices, cached stacks are only copied
+        with self.stage('decode', batch, 2 * nx * ny * nImages * self.dtype.itemsize):
+            matrices = {}
+            decodeMatrices = {}
+            cacheKeys = {}
+            imagesProcessed = 0
+            for frameSet in ['a', 'b']:
+                #Create matrix to concatenate images
+                matrices[frameSet] = self.allocate_matrix('D_%s_%i'%(frameSet, slot), (nx * ny, nImages))
+
+                #Skip decoding if the stack is cached
+                if self.stackCache is not None:
+                    cacheKeys[frameSet] = self.cache_key(imageNumbers, frameSet)
+
+                    if self.stackCache.load(cacheKeys[frameSet], matrices[frameSet]):
+                        del cacheKeys[frameSet]
+                        imagesProcessed += nImages
+                        self.progress(imagesProcessed/(2*nImages)*100, '[Batch %i of %i] Loaded %s images from cache'%(batch+1, self.nBatches, frameSet.upper()))
+                        continue
+
+                decodeMatrices[frameSet] = matrices[frameSet]
+
+            #Both frame sets are decoded together, so an image holding both frames is only read once
+            fillStart = time.perf_counter()
+            futures = self.submit_frames(decodeMatrices, imageNumbers)
+            reporter = self.progress_reporter(2*nImages, nx * ny * self.dtype.itemsize)
+            reporter.skip(imagesProcessed)
+
+            for future in as_completed(futures):
+                frameSets, k = futures[future]
+                crops = future.result()
+
+                #Frames that could not be written by the worker process 
+                if crops is not None:
+                    for frameSet, crop in zip(frameSets, crops):
+                        if crop is not None:
+                            fill_frame(matrices[frameSet][:, k], crop)
+
+                imagesProcessed += len(frameSets)
+                reporter.update(imagesProcessed, '[Batch %i of %i] Processed image %i of %i', batch+1, self.nBatches, imagesProcessed, 2*nImages)
+
+            #Throughput of decoding and filling the data matrices
+            nFrames = len(decodeMatrices) * nImages
+            if nFrames > 0:
+                fillTime = time.perf_counter() - fillStart
+                self.fillThroughput = nFrames * nx * ny * self.dtype.itemsize / max(fillTime, 1e-9) / 1024**2
+                self.progress(100, '[Batch %i of %i] Filled %i images (%.0f MB/s)'%(batch+1, self.nBatches, nFrames, self.fillThroughput))
+
+        self.batch_timings(batch)['decode'] = time.perf_counter() - decodeStart
+
+        #Cache the stacks we had to decode, this is timed on its own so it doesn't count as decoding
+        #The matrices are filtered in place, so they are stored before we hand them on
+        for frameSet in cacheKeys:
+            with self.stage('cache', batch, matrices[frameSet].shape[0] * nImages * 4):
+                self.stackCache.store(cacheKeys[frameSet], matrices[frameSet])
+
+        return matrices
+
+    #Cache key of the images of a frame set (with the current crop, flip and cut settings)
+    def cache_key(self, imageNumbers, frameSet):
+        imagePaths = [self.frame_path(imageNumber, frameSet)[0] for imageNumber in imageNumbers]
+
+        return self.stackCache.key(imagePaths, self.cropList, self.flipImage, self.cutImages, frameSet)
+
+    #Filter the A and B matrices of a batch at the same time, splitting the BLAS threads between them
+    def compute_batch(self, batch, slot, matrices):
+        self.progress(0, '[Batch %i of %i] Computing Filtered Matrices'%(batch+1, self.nBatches))
+
+        #Reuse the temporal basis if this batch was already computed
+        bases = self.bases.get(batch, {'a': None, 'b': None})
+
+        #Projection of the data on the kept modes, this lets us change nModes later with a cheap update
+        #Only the batch that stays in memory needs it
+        ny, nx = self.imageShape
+        modeCoefficients = {'a': None, 'b': None}
+        if self.keepCoefficients and batch == self.coefficientBatch:
+            for frameSet in ['a', 'b']:
+                modeCoefficients[frameSet] = self.allocate_matrix('T_%s'%frameSet, (nx * ny, min(self.keepModes, matrices[frameSet].shape[1])))
+
+        with threadpool_limits(limits = self.blasThreads), ThreadPoolExecutor(max_workers = 2) as executor:
+            futureA = executor.submit(self.filter_frame_set, matrices['a'], modeCoefficients['a'], bases['a'])
+            futureB = executor.submit(self.filter_frame_set, matrices['b'], modeCoefficients['b'], bases['b'])
+
+            D_a_filt, basisA, deviationA = futureA.result()
+            D_b_filt, basisB, deviationB = futureB.result()
+
+        self.bases[batch] = {'a': basisA, 'b': basisB}
+        self.Lambda_a = basisA[1]
+        self.Lambda_b = basisB[1]
+
+        self.D_a_filt = D_a_filt
+        self.D_b_filt = D_b_filt
+        self.modeCoefficients = modeCoefficients if modeCoefficients['a'] is not None else None
+        self.residentBatch = batch
+        self.residentSlot = slot
+
+        #Largest difference between the filtered images and a float64 computation, None if it wasn't checked
+        self.maxDeviation = None if deviationA is None else max(deviationA, deviationB)
+
+        if self.maxDeviation is None:
+            self.progress(100, '[Batch %i of %i] Finished Computing'%(batch+1, self.nBatches))
+        else:
+            self.progress(100, '[Batch %i of %i] Finished Computing (%s, max deviation from float64: %.3g)'%(batch+1, self.nBatches, self.dtype.name, self.maxDeviation))
+
+        return D_a_filt, D_b_filt
+
+    #Path of image number imageNumber of the frame set ('a' or 'b') and which half of the image holds it
+    def frame_path(self, imageNumber, frameSet):
+        if self.cutImages:  
+            return self.imageList[imageNumber], frameSet
+
+        elif frameSet == 'a':
+            return self.imageAList[imageNumber], None
+
+        else:
+            return self.imageBList[imageNumber], None
+
+    #Images holding frame imageNumber of the frame sets - [(path, frame sets, halves)]
+    #With cut images both frames are in the same image, so it is only listed once
+    def frame_sources(self, imageNumber, frameSets):
+        sources = {}
+        for frameSet in frameSets:
+            imagePath, half = self.frame_path(imageNumber, frameSet)
+            source = sources.setdefault(imagePath, ([], []))
+            source[0].append(frameSet)
+            source[1].append(half)
+
+        return [(imagePath, frameSetList, halves) for imagePath, (frameSetList, halves) in sources.items()]
+
+    #Decode the frames of one image into column k of the matrices of their frame sets (runs in the decoding threads)
+    def fill_columns(self, matrices, k, imagePath, frameSets, halves):
+        crops = read_cropped_frames(imagePath, halves, self.cropList, self.flipImage)
+
+        #Column k is contiguous, the frame is cast to float (we work with floating number not integers) as it is copied
+        for frameSet, crop in zip(frameSets, crops):
+            fill_frame(matrices[frameSet][:, k], crop)
+
+    #Send the images of the frame sets to the decoding workers, one task per image
+    #Returns the futures with their frame sets and column. Every worker knows its column, so the order
+    #doesn't depend on which image is decoded first
+    def submit_frames(self, matrices, imageNumbers):
+        futures = {}
+        for k, imageNumber in enumerate(imageNumbers):
+            for imagePath, frameSets, halves in self.frame_sources(imageNumber, list(matrices)):
+
+                if self.decodeBackend == 'process':
+                    matrixPaths = [matrices[frameSet].filename if isinstance(matrices[frameSet], np.memmap) else None for frameSet in frameSets]
+                    D = matrices[frameSets[0]]
+
+                    future = self.decodeExecutor.submit(decode_frame_process, imagePath, halves, self.cropList, self.flipImage, 
+                                                        matrixPaths, D.dtype, D.shape, k)
+                else:
+                    future = self.decodeExecutor.submit(self.fill_columns, matrices, k, imagePath, frameSets, halves)
+
+                futures[future] = (frameSets, k)
+
+        return futures
+
+    #Compute the temporal basis of one data matrix (unless we have it already) and remove the modes
+    #T receives the projection of the data on the kept modes (None if they aren't stored)
+    #Returns the filtered matrix, the basis (Psi, Lambda) and the max deviation from float64 (None if it isn't checked)
+    def filter_frame_set(self, D, T, basis = None):
+        batch = self.computingBatch
+
+        if basis is None:
+            # Compute the correlation matrix
+            with self.stage('gram', batch, D.nbytes):
+                K = self.correlation_matrix(D)
+
+            # Comput the Temporal basis 
+            with self.stage('eigen', batch, K.nbytes):
+                basis = self.temporal_basis(K)
+
+        # Remove the leading modes from the data matrix (in place)
+        with self.stage('projection', batch, D.nbytes):
+            D, maxDeviation = self.remove_modes(D, basis[0], T)
+
+        #Write the filtered matrix to the scratch file so write_batch reads it from disk
+        if isinstance(D, np.memmap):
+            D.flush()
+        if isinstance(T, np.memmap):
+            T.flush()
+
+        return D, basis, maxDeviation
+
+    #Change the number of removed modes of the batch in memory, reusing its temporal basis
+    #Only the modes between the old and new number are added back or removed, a rank |nModes - old| update 
+    #Returns False (and changes nothing) if the batch has to be computed again, e.g. more modes than were kept
+    def refilter(self, nModes):
+        if self.modeCoefficients is None or nModes > self.modeCoefficients['a'].shape[1]:
+            return False
+
+        low, high = sorted((nModes, self.nModes))
+        if low == high:
+            return True
+
+        #Fewer modes means we add the modes back
+        sign = 1 if nModes < self.nModes else -1
+
+        for frameSet, D in [('a', self.D_a_filt), ('b', self.D_b_filt)]:
+            Psi = self.filtered_modes(self.bases[self.residentBatch][frameSet][0][:, low:high]).astype(D.dtype)
+            T = self.modeCoefficients[frameSet]
+
+            for start in range(0, D.shape[0], self.tileSize):
+                tile = D[start:start + self.tileSize]
+                tile += sign * np.dot(T[start:start + self.tileSize, low:high], Psi.transpose())
+
+            if isinstance(D, np.memmap):
+                D.flush()
+
+        self.nModes = nModes
+        return True
+
+    #Temporal modes as they appear in the filtered images (filters applied after the mode removal change them too)
+    def filtered_modes(self, Psi):
+        return Psi
+
+    #Allocate a data matrix in RAM, in a memory mapped file in the scratch folder, 
+    #or in a temporary file in the save folder when streaming
+    #Mapped matrices are stored column by column (Fortran order) so every snapshot is contiguous on disk
+    def allocate_matrix(self, name, shape):
+        if self.scratchFolder is not None:
+            self.scratchFolder.mkdir(parents = True, exist_ok = True)
+            scratchPath = self.scratchFolder / ('%s.dat'%name)
+
+            #Reuse the file from the last batch if it has the right size, every column is overwritten anyway
+            nBytes = shape[0] * shape[1] * self.dtype.itemsize
+            if scratchPath.exists() and scratchPath.stat().st_size == nBytes:
+                mode = 'r+'
+            else:
+                mode = 'w+'
+
+            return np.memmap(scratchPath, dtype = self.dtype, mode = mode, shape = shape, order = 'F')
+
+        if self.streaming:
+            self.saveFolder.mkdir(exist_ok = True)
+
+            #The file is deleted as soon as the matrix is released
+            scratchFile = tempfile.TemporaryFile(dir = self.saveFolder, suffix = '.pod')
+            return np.memmap(scratchFile, dtype = self.dtype, mode = 'w+', shape = shape, order = 'F')
+
+        #Fortran order so every image is a contiguous column, all columns are overwritten so it isn't zeroed
+        return np.empty(shape, dtype = self.dtype, order = 'F')
+
+    #Correlation matrix K = D^T D, accumulated in float64 over blocks of pixel rows
+    #This never needs more than one tile of D in memory, memory mapped matrices are always done this way
+    def correlation_matrix(self, D):
+        if D.dtype == np.float64 and not isinstance(D, np.memmap):
+            return np.dot(D.transpose(), D)
+
+        K = np.zeros((D.shape[1], D.shape[1]))
+        for start in range(0, D.shape[0], self.tileSize):
+            tile = np.float64(D[start:start + self.tileSize])
+            K += np.dot(tile.transpose(), tile)
+
+        return K
+
+    #Compute the leading temporal modes (keepModes columns of Psi) and eigenvalues of the correlation matrix K
+    #Eigenvalues are sorted in descending order, as returned by the svd
+    def temporal_basis(self, K):
+        n = K.shape[0]
+        nKeep = min(self.keepModes, n)
+
+        if self.eigSolver == 'svd':
+            Psi, Lambda, _ = np.linalg.svd(K)
+            return Psi[:, :nKeep], Lambda
+
+        #Pick the cheapest solver for the batch size if we don't force one
+        method = self.eigSolver
+        if method == 'auto':
+            if n <= 1000:
+                method = 'full'
+            elif n <= 4000:
+                method = 'subset'
+            else:
+                method = 'lanczos'
+
+        #Lanczos needs fewer modes than the size of the matrix 
+        if method == 'lanczos' and nKeep >= n - 1:
+            method = 'subset'
+
+        if nKeep == 0:
+            Psi = np.zeros((n, 0))
+            Lambda = np.zeros(0)
+
+        elif method == 'full':
+            Lambda, Psi = np.linalg.eigh(K)
+
+        elif method == 'subset':
+            Lambda, Psi = eigh(K, subset_by_index = [n - nKeep, n - 1])
+
+        else:
+            #Fixed starting vector so repeated runs give the same basis
+            Lambda, Psi = eigsh(K, k = nKeep, which = 'LA', v0 = np.ones(n))
+
+        #Sort in descending order 
+        order = np.argsort(Lambda)[::-1]
+        Lambda = Lambda[order]
+        Psi = Psi[:, order[:nKeep]]
+
+        #The eigenvalues alone are much cheaper than the full decomposition
+        if self.fullSpectrum and len(Lambda) < n:
+            Lambda = np.linalg.eigvalsh(K)[::-1]
+
+        return Psi, Lambda
+
+    #Subtract the first nModes modes of Psi from D in place: D - (D Psi) Psi^T
+    #This is a rank nModes update, so we never form the nPairs x nPairs projection matrix 
+    #and we work over blocks of pixel rows so no second copy of D is needed
+    #T (if there is one) receives D Psi for all the kept modes so they can be added back or removed later
+    #Returns D and the max deviation from doing the same update in float64 (None unless checkPrecision is on)
+    def remove_modes(self, D, Psi, T):
+        #Only float32 matrices are checked against float64
+        checkPrecision = self.checkPrecision and D.dtype != np.float64
+        maxDeviation = 0.0 if checkPrecision else None
+
+        if Psi.shape[1] == 0:
+            return D, maxDeviation
+
+        PsiD = Psi.astype(D.dtype)
+        PsiRemoved = Psi[:, :self.nModes]
+        PsiRemovedD = PsiD[:, :self.nModes]
+
+        for start in range(0, D.shape[0], self.tileSize):
+            tile = D[start:start + self.tileSize]
+
+            #Projection on the kept modes, or only on the removed ones if we don't store it
+            if T is None:
+                coefficients = np.dot(tile, PsiRemovedD)
+            else:
+                T[start:start + self.tileSize] = np.dot(tile, PsiD)
+                coefficients = T[start:start + self.tileSize, :self.nModes]
+
+            if not checkPrecision:
+                tile -= np.dot(coefficients, PsiRemovedD.transpose())
+
+            else:
+                #Reference tile in float64 to report the precision loss
+                reference = np.float64(tile)
+                reference -= np.dot(np.dot(reference, PsiRemoved), PsiRemoved.transpose())
+
+                tile -= np.dot(coefficients, PsiRemovedD.transpose())
+                maxDeviation = max(maxDeviation, np.max(np.abs(tile - reference)))
+
+        return D, maxDeviation
+
+    #Save the filtered A and B matrices of a batch as images
+    def write_batch(self, batch, D_a_filt, D_b_filt):
+        #Make the folder if it doesnt exist
+        self.saveFolder.mkdir(exist_ok = True)
+
+        #Get image shape
+        (ny, nx) = self.imageShape
+
+        if self.outputFormat != 'files':
+            self.write_container(batch, self.output_blocks(batch, D_a_filt, D_b_filt))
+            return
+
+        #The old images of this batch are overwritten, so its manifest is no longer valid
+        remove_manifest(self.saveFolder, batch)
+        writeStart = time.perf_counter()
+
+        batchImages = self.batch_images(batch)
+        futures = {}
+        failed = []
+        imagesSaved = 0
+        reporter = self.progress_reporter(2 * len(batchImages), nx * ny * self.outputDtype.itemsize)
+
+        #Wait for the images of a block, so its buffers can be reused
+        def wait_block(blockFutures):
+            nonlocal imagesSaved
+            for future in blockFutures:
+                if future.exception() is not None:
+                    failed.append((futures[future], future.exception()))
+
+                #Update the signal
+                imagesSaved += 1
+                reporter.update(imagesSaved, '[Batch %i of %i] Saving Image %i of %i', batch+1, self.nBatches, imagesSaved, 2 * len(batchImages))
+
+        with self.stage('write', batch) as stageRecord:
+            with ImageWriter(self.writeWorkers) as writer:
+                #A block is saved by the writer threads while the next one is converted in the other buffers
+                blockFutures = []
+                for start, blockA, blockB in self.output_blocks(batch, D_a_filt, D_b_filt, nBuffers = 2):
+                    lastBlock = blockFutures
+                    blockFutures = []
+
+                    for k in range(blockA.shape[1]):
+                        #Columns are contiguous, so the images are views of the buffers
+                        imageNumber = batchImages[start + k]
+                        imageNameA = self.saveFolder / ('A%04da.tif'%imageNumber)
+                        imageNameB = self.saveFolder / ('A%04db.tif'%imageNumber)
+
+                        for imageName, block in [(imageNameA, blockA), (imageNameB, blockB)]:
+                            future = writer.submit(imageName, np.reshape(block[:, k], (ny, nx)))
+                            futures[future] = imageName
+                            blockFutures.append(future)
+
+                    #The next block is converted into the buffers of the last one
+                    wait_block(lastBlock)
+
+                wait_block(blockFutures)
+
+            stageRecord['bytes'] = writer.bytesWritten
+
+        if len(failed) > 0:
+            raise OSError('could not save %i images (%s: %s)'%(len(failed), failed[0][0].name, failed[0][1]))
+
+        self.batch_timings(batch)['write'] = time.perf_counter() - writeStart
+        self.write_batch_manifest(batch, [imageName.name for imageName in futures.values()])
+
+        self.progress(100, '[Batch %i of %i] Finished Saving (%.0f MB/s)'%(batch+1, self.nBatches, writer.throughput()))
+        self.saved(True)
+
+    #Record a saved batch, written last so only batches with all their images have one
+    def write_batch_manifest(self, batch, outputFiles):
+        manifest = {'batch': batch, 'nBatches': self.nBatches, 'settingsHash': self.settings_hash(),
+                    'filter': self.engine_class().__name__, 'nModes': self.nModes,
+                    'frames': [self.batchStarts[batch], self.batchStarts[batch+1]],
+                    'eigenvalues': None, 'timings': self.batch_timings(batch),
+                    'outputFiles': sorted(outputFiles), 'saved': time.strftime('%Y-%m-%d %H:%M:%S')}
+
+        if batch in self.bases:
+            manifest['eigenvalues'] = {frameSet: [float(value) for value in self.bases[batch][frameSet][1]] for frameSet in ['a', 'b']}
+
+        write_manifest(self.saveFolder, batch, manifest)
+
+    #Save the converted images of a batch in .npy files, for the process writing the container
+    #The images are converted straight into the memory mapped files, a block at a time
+    def export_batch(self, batch, D_a_filt, D_b_filt):
+        self.saveFolder.mkdir(exist_ok = True)
+
+        clipBuffer = np.empty((D_a_filt.shape[0], max(1, min(self.convertColumns, D_a_filt.shape[1]))), dtype = self.dtype, order = 'F')
+        imageFiles = {}
+        with self.stage('convert', batch, D_a_filt.nbytes + D_b_filt.nbytes):
+            for frameSet, D in [('a', D_a_filt), ('b', D_b_filt)]:
+                imageFiles[frameSet] = self.saveFolder / ('batch_%06i_%s.npy'%(batch, frameSet))
+
+                images = np.lib.format.open_memmap(imageFiles[frameSet], mode = 'w+', dtype = self.outputDtype, shape = D.shape, fortran_order = True)
+                convert_to_output(D, images, clipBuffer, self.outputScale)
+                images.flush()
+                del images
+
+        return imageFiles
+
+    #Add the images of a batch exported by a worker to the container and delete the files
+    def write_exported_batch(self, batch, imageFiles):
+        imagesA = np.load(imageFiles['a'], mmap_mode = 'r')
+        imagesB = np.load(imageFiles['b'], mmap_mode = 'r')
+        self.write_container(batch, column_blocks(imagesA, imagesB, max(1, self.convertColumns)))
+
+        #The files can't be deleted while they are mapped (on Windows)
+        del imagesA, imagesB
+        for imageFile in imageFiles.values():
+            imageFile.unlink()
+
+    #Add the converted images of a batch to the output container (opened on the first batch)
+    #blocks gives the first column and the A and B images of every block of the batch (see output_blocks)
+    def write_container(self, batch, blocks):
+        (ny, nx) = self.imageShape
+
+        if self.container is None:
+            self.container = open_container_writer(self.saveFolder, self.outputFormat, self.compressOutput)
+
+        startTime = time.perf_counter()
+        batchImages = self.batch_images(batch)
+        nBytes = 2 * nx * ny * len(batchImages) * self.outputDtype.itemsize
+        reporter = self.progress_reporter(len(batchImages), 2 * nx * ny * self.outputDtype.itemsize, unit = 'pairs')
+        with self.stage('write', batch, nBytes):
+            for start, blockA, blockB in blocks:
+                for k in range(blockA.shape[1]):
+                    imageNumber = batchImages[start + k]
+                    self.container.write('a', imageNumber, np.reshape(blockA[:, k], (ny, nx)))
+                    self.container.write('b', imageNumber, np.reshape(blockB[:, k], (ny, nx)))
+
+                    reporter.update(start + k + 1, '[Batch %i of %i] Saving Image Pair %i of %i', batch+1, self.nBatches, start + k + 1, len(batchImages))
+
+        throughput = nBytes / max(time.perf_counter() - startTime, 1e-9) / 1024**2
+        self.progress(100, '[Batch %i of %i] Finished Saving (%.0f MB/s)'%(batch+1, self.nBatches, throughput))
+        self.saved(True)
+
+    def close_container(self):
+        if self.container is not None:
+            self.container.close()
+            self.container = None
+
+    #Convert the filtered A and B matrices of a batch to the output type, convertColumns images at a time
+    #Yields the first column of every block and its A and B images (in Fortran order so every image is a column)
+    #nBuffers sets of blocks are used in turn, a block must be saved before the one nBuffers later is asked for
+    #The blocks are only allocated while the batch is saved
+    def output_blocks(self, batch, D_a_filt, D_b_filt, nBuffers = 1):
+        nPixels, nColumns = D_a_filt.shape
+        blockColumns = max(1, min(self.convertColumns, nColumns))
+
+        clipBuffer = np.empty((nPixels, blockColumns), dtype = self.dtype, order = 'F')
+        buffers = [{frameSet: np.empty((nPixels, blockColumns), dtype = self.outputDtype, order = 'F') for frameSet in ['a', 'b']}
+                   for _ in range(nBuffers)]
+
+        convertTime = 0.0
+        for ii, start in enumerate(range(0, nColumns, blockColumns)):
+            convertStart = time.perf_counter()
+            blocks = buffers[ii % nBuffers]
+            blockA = convert_to_output(D_a_filt[:, start:start + blockColumns], blocks['a'], clipBuffer, self.outputScale)
+            blockB = convert_to_output(D_b_filt[:, start:start + blockColumns], blocks['b'], clipBuffer, self.outputScale)
+            convertTime += time.perf_counter() - convertStart
+
+            yield start, blockA, blockB
+
+        #Converting is interleaved with saving, so it is timed on its own
+        self.log_stage('convert', convertTime, D_a_filt.nbytes + D_b_filt.nbytes, batch)
+
+    #Image k of a filtered matrix as it is saved (used by the preview)
+    def output_image(self, D, k):
+        image = np.empty((D.shape[0], 1), dtype = self.outputDtype, order = 'F')
+        convert_to_output(D[:, k:k+1], image, np.empty((D.shape[0], 1), dtype = self.dtype, order = 'F'), self.outputScale)
+
+        return np.reshape(image, self.imageShape)
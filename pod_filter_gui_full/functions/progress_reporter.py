@@ -0,0 +1,77 @@
+#Rate limited progress of a stage - a loop over thousands of frames reports every frame, but the label is only
+#formatted and passed on a few times a second, with the frames/s, MB/s and time left of the stage
+#It only needs a progress(percent, label) callback, so the Qt adapters and pod_cli.py both use it
+
+import time
+
+#Default number of progress updates per second
+PROGRESS_RATE = 10
+
+
+#Time left as text, e.g. '42 s' or '3 min 05 s'
+def format_eta(seconds):
+    seconds = int(round(seconds))
+
+    if seconds < 60:
+        return '%i s'%seconds
+    elif seconds < 3600:
+        return '%i min %02i s'%(seconds // 60, seconds % 60)
+
+    return '%i h %02i min'%(seconds // 3600, (seconds % 3600) // 60)
+
+
+class ProgressReporter:
+    #total items in the stage, itemBytes is the size of an item for the MB/s (0 to leave it out)
+    #At most maxRate updates per second are passed on, the last item is always reported
+    def __init__(self, progress, total, itemBytes = 0, maxRate = PROGRESS_RATE, unit = 'frames'):
+        self.progress = progress
+        self.total = total
+        self.itemBytes = itemBytes
+        self.unit = unit
+
+        self.interval = 1/maxRate if maxRate > 0 else 0.0
+        self.startTime = time.perf_counter()
+        self.nextUpdate = self.startTime
+
+        #Items done without work (e.g. loaded from the cache) count for the percentage but not for the rate
+        self.skipped = 0
+
+    #Count items done without work
+    def skip(self, count):
+        self.skipped += count
+
+    #done items of the stage are finished - the label (label % args) is only formatted when it is passed on
+    #nBytes is the number of bytes done so far, if the items don't all have the same size
+    def update(self, done, label, *args, nBytes = None):
+        now = time.perf_counter()
+        if now < self.nextUpdate and done < self.total:
+            return
+
+        #The first update is too early for a rate
+        rateText = '' if self.nextUpdate == self.startTime else self.rate_text(done, now, nBytes)
+        self.nextUpdate = now + self.interval
+
+        if len(args) > 0:
+            label = label % args
+
+        self.progress(done/max(self.total, 1)*100, label + rateText)
+
+    #Throughput and time left since the start of the stage
+    def rate_text(self, done, now, nBytes = None):
+        elapsed = now - self.startTime
+        worked = done - self.skipped
+        if worked <= 0 or elapsed <= 0:
+            return ''
+
+        itemRate = worked / elapsed
+        rates = ['%.0f %s/s'%(itemRate, self.unit)]
+
+        if nBytes is None and self.itemBytes > 0:
+            nBytes = worked * self.itemBytes
+        if nBytes is not None:
+            rates.append('%.0f MB/s'%(nBytes / elapsed / 1024**2))
+
+        if done < self.total:
+            rates.append('ETA %s'%format_eta((self.total - done) / itemRate))
+
+        return ' (%s)'%', '.join(rates)
@@ -0,0 +1,128 @@
+#On-disk cache of decoded (cropped and flipped) image stacks
+#This module doesn't need Qt, so it can also be used by POD_Filter_Script.py
+
+from pathlib import Path
+import numpy as np
+import hashlib
+import tempfile
+import threading
+import os
+
+#Default location, shared by the GUI and the script
+DEFAULT_CACHE_FOLDER = Path(tempfile.gettempdir()) / 'pod_filter_cache'
+
+#Default size limit of the cache in bytes
+DEFAULT_CACHE_SIZE = 8*1024**3
+
+#Number of columns copied at once when storing/loading, so we never hold a second full copy of the stack
+CHUNK_COLUMNS = 16
+
+
+class StackCache:
+    #Stacks are stored as float32 .npy files of shape (pixels, images), one per frame set and batch
+    #Image values are integers so float32 keeps them exactly
+    def __init__(self, folder = DEFAULT_CACHE_FOLDER, sizeLimit = DEFAULT_CACHE_SIZE):
+        self.folder = Path(folder)
+        self.sizeLimit = sizeLimit
+
+        self.folder.mkdir(parents = True, exist_ok = True)
+
+        #The A and B frame sets (and pipelined batches) use the cache from different threads
+        self.lock = threading.Lock()
+
+        #A smaller limit than the last run (or another cache in the same folder) applies right away
+        self.evict()
+
+    #Key of a stack - changes if any image is replaced/modified or if the crop, flip or cut settings change
+    def key(self, imagePaths, cropList, flipImage, cutImages, frameSet):
+        keyHash = hashlib.sha1()
+        keyHash.update(repr((list(cropList), bool(flipImage), bool(cutImages), frameSet)).encode())
+
+        for imagePath in imagePaths:
+            imagePath = Path(imagePath).resolve()
+            stat = imagePath.stat()
+            keyHash.update(('%s|%i|%i\n'%(imagePath, stat.st_size, stat.st_mtime_ns)).encode())
+
+        return keyHash.hexdigest()
+
+    def path(self, key):
+        return self.folder / ('%s.npy'%key)
+
+    #Copy a cached stack into D, returns False if it isn't cached (or doesn't match the shape of D)
+    def load(self, key, D):
+        stackPath = self.path(key)
+
+        try:
+            stack = np.load(stackPath, mmap_mode = 'r')
+        except (OSError, ValueError):
+            return False
+
+        if stack.shape != D.shape:
+            return False
+
+        for start in range(0, D.shape[1], CHUNK_COLUMNS):
+            D[:, start:start+CHUNK_COLUMNS] = stack[:, start:start+CHUNK_COLUMNS]
+
+        del stack
+
+        #Mark it as recently used for the eviction
+        try:
+            os.utime(stackPath)
+        except OSError:
+            pass
+
+        return True
+
+    #Store the stack in D under key, then evict the least recently used stacks over the size limit
+    def store(self, key, D):
+        stackPath = self.path(key)
+
+        #Write to a temporary file first so a stack is never read half written
+        tempPath = self.folder / ('%s.%i.%i.tmp'%(key, os.getpid(), threading.get_ident()))
+
+        try:
+            stack = np.lib.format.open_memmap(tempPath, mode = 'w+', dtype = np.float32, shape = D.shape, fortran_order = True)
+            for start in range(0, D.shape[1], CHUNK_COLUMNS):
+                stack[:, start:start+CHUNK_COLUMNS] = D[:, start:start+CHUNK_COLUMNS]
+
+            stack.flush()
+            del stack
+
+            os.replace(tempPath, stackPath)
+
+        except OSError:
+            #A full disk shouldn't stop the computation, we just don't cache
+            if tempPath.exists():
+                tempPath.unlink()
+            return
+
+        self.evict()
+
+    #Remove the least recently used stacks until the cache fits in the size limit
+    def evict(self):
+        with self.lock:
+            stacks = []
+            for stackPath in self.folder.glob('*.npy'):
+                try:
+                    stat = stackPath.stat()
+                except FileNotFoundError:
+                    continue
+                stacks.append((stat.st_mtime, stat.st_size, stackPath))
+
+            totalSize = sum([size for _, size, _ in stacks])
+
+            for _, size, stackPath in sorted(stacks):
+                if totalSize <= self.sizeLimit:
+                    break
+
+                try:
+                    stackPath.unlink()
+                except FileNotFoundError:
+                    pass
+
+                totalSize -= size
+
+    def clear(self):
+        with self.lock:
+            for stackPath in self.folder.glob('*.npy'):
+                stackPath.unlink()
@@ -0,0 +1,158 @@
+#Timers of the stages of a run (decoding, Gram matrices, eigen decomposition, projection, conversion, writing...)
+#Every stage is timed with the bytes it processed and the peak memory of the process while it ran, and is added
+#as one JSON line to the run log in the save folder. Batch workers append to the same log with the id of the run
+#This module doesn't need Qt, so the GUI and pod_cli.py share it
+
+from contextlib import contextmanager
+from pathlib import Path
+import threading
+import json
+import time
+import uuid
+import sys
+import os
+
+#Run log in the save folder
+RUN_LOG = 'run_log.jsonl'
+
+#Order of the stages in the summary, other stages follow in the order they ran
+STAGE_ORDER = ['read', 'cut', 'decode', 'cache', 'background', 'gram', 'eigen', 'projection', 'filter', 'fft', 'convert', 'write']
+
+
+#Peak resident memory of this process in bytes, None if we can't tell
+#Linux gives the peak since it was last reset (VmHWM), otherwise we only have the peak of the whole process
+def peak_rss():
+    try:
+        with open('/proc/self/status') as statusFile:
+            for line in statusFile:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    #ru_maxrss is in bytes on macOS and in kB elsewhere
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+#Start a new peak at the current memory (Linux only, elsewhere the peak is that of the whole process)
+def reset_peak_rss():
+    try:
+        with open('/proc/self/clear_refs', 'w') as clearFile:
+            clearFile.write('5')
+    except OSError:
+        pass
+
+#Records of one run in a run log, an empty list if there isn't a readable log
+def read_run_log(logPath, runId = None):
+    records = []
+    try:
+        with open(logPath) as logFile:
+            for line in logFile:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+
+                if runId is None or record.get('run') == runId:
+                    records.append(record)
+    except OSError:
+        pass
+
+    return records
+
+#Time, bytes and peak memory of every stage, in the order of STAGE_ORDER - {stage: {'seconds', 'bytes', 'peakRss'}}
+def stage_totals(records):
+    totals = {}
+    for record in records:
+        total = totals.setdefault(record['stage'], {'seconds': 0.0, 'bytes': 0, 'peakRss': 0})
+        total['seconds'] += record['seconds']
+        total['bytes'] += record['bytes']
+        total['peakRss'] = max(total['peakRss'], record['peakRss'] or 0)
+
+    order = [stage for stage in STAGE_ORDER if stage in totals] + [stage for stage in totals if stage not in STAGE_ORDER]
+    return {stage: totals[stage] for stage in order}
+
+#One line summary of the records of a run, e.g. 'decode 2.1 s (410 MB/s), gram 0.8 s, ... - peak RSS 1.2 GB'
+#Stages of the batch workers and of the A and B frame sets overlap, so the times can add up to more than the run
+def run_summary(records):
+    totals = stage_totals(records)
+    if len(totals) == 0:
+        return 'No stages timed'
+
+    stages = []
+    for stage, total in totals.items():
+        text = '%s %.2f s'%(stage, total['seconds'])
+        if total['bytes'] > 0 and total['seconds'] > 0:
+            text += ' (%.0f MB/s)'%(total['bytes'] / total['seconds'] / 1024**2)
+
+        stages.append(text)
+
+    peak = max(total['peakRss'] for total in totals.values())
+    if peak > 0:
+        return '%s - peak RSS %.0f MB'%(', '.join(stages), peak / 1024**2)
+
+    return ', '.join(stages)
+
+
+class StageTimer:
+    #Records are added to the log at logPath (if there is one), tagged with runId
+    def __init__(self, logPath = None, runId = None):
+        self.logPath = logPath
+        self.runId = runId or '%s-%s'%(time.strftime('%Y%m%d-%H%M%S'), uuid.uuid4().hex[:8])
+
+        #Records of the stages timed in this process
+        self.records = []
+        self.lock = threading.Lock()
+
+        #The peak memory is only reset when no stage is running, overlapping stages share their peak
+        self.activeStages = 0
+
+    #Time the code in the with block, the bytes can also be set on the record it gives once they are known
+    #A stage that raises isn't recorded
+    @contextmanager
+    def stage(self, name, batch = None, nBytes = 0):
+        with self.lock:
+            if self.activeStages == 0:
+                reset_peak_rss()
+            self.activeStages += 1
+
+        record = {'bytes': nBytes}
+        startTime = time.perf_counter()
+        try:
+            yield record
+        finally:
+            with self.lock:
+                self.activeStages -= 1
+
+        self.add(name, time.perf_counter() - startTime, record['bytes'], batch)
+
+    #Record a stage timed elsewhere (e.g. the time spent in a loop), returns the record
+    def add(self, name, seconds, nBytes = 0, batch = None):
+        record = {'run': self.runId, 'stage': name, 'batch': batch, 'seconds': round(seconds, 6), 'bytes': int(nBytes),
+                  'MBps': round(nBytes / seconds / 1024**2, 1) if seconds > 0 and nBytes > 0 else None,
+                  'peakRss': peak_rss(), 'pid': os.getpid(), 'time': time.strftime('%Y-%m-%d %H:%M:%S')}
+
+        with self.lock:
+            self.records.append(record)
+
+            if self.logPath is not None:
+                Path(self.logPath).parent.mkdir(parents = True, exist_ok = True)
+                with open(self.logPath, 'a') as logFile:
+                    logFile.write(json.dumps(record) + '\n')
+
+        return record
+
+    #Records of this run in the log, with those of the batch workers - the records of this process without a log
+    def run_records(self):
+        if self.logPath is None:
+            return list(self.records)
+
+        return read_run_log(self.logPath, self.runId)
+
+    def summary(self):
+        return run_summary(self.run_records())
@@ -11,23 +11,26 @@ from gui.panels.main_window import Ui_MainWindow
 from gui.extra_widgets import MplWidget
 
 #Function Classes - we use this class for all of our functions
-from functions.pod_functions import ImageCutter, PODRunner
+from functions.pod_functions import ImageCutter, PODRunner, BackgroundRunner, SlidingBackgroundRunner, FrequencyRunner
+from functions.background_functions import BACKGROUND_LIST, SLIDING_BACKGROUND_LIST
+from functions.frequency_filter import FREQUENCY_FILTER_LIST
+from functions.stack_cache import StackCache, DEFAULT_CACHE_FOLDER
+from functions.image_container import open_container
+from functions.batch_planner import plan_batches, plan_summary, crop_pixels
 
 #Imports for pyqt5 widgets 
-from PyQt5 import QtWidgets, QtCore, QtGui
-from PyQt5.QtCore import pyqtSlot #This is for threading/signals 
+from PyQt5 import QtWidgets
 
 #Dark theme - automatically applies nice stylesheet
 import qdarktheme
 
 #For configuration files
 from configparser import ConfigParser
-import numpy as np
 from pathlib import Path
 import sys
 
 #For reading images
-from skimage.io import imread, imshow, imsave  # this is for Matlab users
+from skimage.io import imread
 
 
 import matplotlib 
@@ -40,6 +43,26 @@ ICON_PATH = Path(__file__).parent.parent.absolute() / 'gui/icons'
 #Image filetype (hard coded) 
 IMAGE_EXTENSION_LIST = ['.tif', '.tiff', '.jpeg', '.png']
 
+#Filters - the POD filter, subtracting a per-pixel background (over every image or a sliding window)
+#or removing temporal frequencies
+FILTER_LIST = ['pod'] + BACKGROUND_LIST + SLIDING_BACKGROUND_LIST + FREQUENCY_FILTER_LIST
+
+#Output formats for cut and POD images - one TIFF per image or a single container
+OUTPUT_FORMAT_LIST = ['files', 'tiff', 'hdf5', 'chunks']
+
+#Eigen solvers for the POD temporal basis - auto picks one from the batch size
+EIG_SOLVER_LIST = ['auto', 'full', 'subset', 'lanczos', 'svd']
+
+#Precision of the POD data matrices - float32 is enough for 8/12-bit images
+DTYPE_LIST = ['float64', 'float32', 'auto']
+
+#Bit depth of the saved POD images and how the filtered values are fitted to it
+OUTPUT_DEPTH_LIST = ['source', 'uint8', 'uint16']
+OUTPUT_SCALING_LIST = ['clip', 'rescale']
+
+#Image decoding workers - processes are for codecs that hold the GIL
+DECODE_BACKEND_LIST = ['thread', 'process']
+
 #Main Window Object
 class MainWindow(Ui_MainWindow):
     #Init function (runs on creation)
@@ -104,10 +127,55 @@ class MainWindow(Ui_MainWindow):
         self.podBatchBox.valueChanged.connect(self.update_batch_boxes)
         self.podPairBox.valueChanged.connect(self.update_batch_boxes)
 
+        #The batch plan follows everything that changes the memory of a batch
+        self.podAutoBatchCheckbox.clicked.connect(self.update_batch_plan)
+        for box in [self.xCropMinBox, self.xCropMaxBox, self.yCropMinBox, self.yCropMaxBox, self.podModeBox, self.windowBox, 
+                    self.medianLevelsBox, self.memoryBudgetBox, self.batchWorkersBox]:
+            box.valueChanged.connect(self.update_batch_plan)
+        for comboBox in [self.podDtypeComboBox, self.filterComboBox, self.eigSolverComboBox, self.outputDepthComboBox]:
+            comboBox.currentTextChanged.connect(self.update_batch_plan)
+        self.streamingCheckbox.clicked.connect(self.update_batch_plan)
+        self.removeModesCheckbox.clicked.connect(self.update_batch_plan)
+
+        #Changing the number of modes reuses the computed temporal basis
+        self.podModeBox.valueChanged.connect(self.refilter_pod_images)
+
+        self.clearStackCacheButton.clicked.connect(self.clear_stack_cache)
+
+        self.previewOutputCheckbox.clicked.connect(self.get_images)
+
+        self.filterComboBox.currentTextChanged.connect(self.update_filter_widgets)
+        self.removeModesCheckbox.clicked.connect(lambda: self.update_filter_widgets(self.filterComboBox.currentText()))
+
 
         for imageType in IMAGE_EXTENSION_LIST:
             self.imageTypeComboBox.addItem(imageType)
 
+        for eigSolver in EIG_SOLVER_LIST:
+            self.eigSolverComboBox.addItem(eigSolver)
+
+        for outputFormat in OUTPUT_FORMAT_LIST:
+            self.outputFormatComboBox.addItem(outputFormat)
+
+        for filterType in FILTER_LIST:
+            self.filterComboBox.addItem(filterType)
+        self.update_filter_widgets(self.filterComboBox.currentText())
+
+        for outputDepth in OUTPUT_DEPTH_LIST:
+            self.outputDepthComboBox.addItem(outputDepth)
+
+        for outputScaling in OUTPUT_SCALING_LIST:
+            self.outputScalingComboBox.addItem(outputScaling)
+
+        #Reader for the saved POD output preview
+        self.outputReader = None
+
+        for dtype in DTYPE_LIST:
+            self.podDtypeComboBox.addItem(dtype)
+
+        for decodeBackend in DECODE_BACKEND_LIST:
+            self.decodeBackendComboBox.addItem(decodeBackend)
+
         #Automatically load our app configuration
         self.load_app_config()
 
@@ -168,6 +236,36 @@ class MainWindow(Ui_MainWindow):
         self.podFlipImageCheckbox.setChecked(bool(self.settings['POD Settings']['flipImages']))
         self.podCutImagesCheckbox.setChecked(bool(self.settings['POD Settings']['cutImages']))
 
+        #Engine settings (older config files might not have these)
+        self.eigSolverComboBox.setCurrentText(self.settings['POD Settings'].get('eigSolver', 'auto'))
+        self.fullSpectrumCheckbox.setChecked(self.settings['POD Settings'].get('fullSpectrum', 'False') == 'True')
+        self.podDtypeComboBox.setCurrentText(self.settings['POD Settings'].get('dtype', 'float64'))
+        self.podCheckPrecisionCheckbox.setChecked(self.settings['POD Settings'].get('checkPrecision', 'False') == 'True')
+        self.streamingCheckbox.setChecked(self.settings['POD Settings'].get('streaming', 'False') == 'True')
+        self.scratchFolderEdit.setText(self.settings['POD Settings'].get('scratchFolder', ''))
+        self.decodeWorkersBox.setValue(int(self.settings['POD Settings'].get('decodeWorkers', '4')))
+        self.decodeBackendComboBox.setCurrentText(self.settings['POD Settings'].get('decodeBackend', 'thread'))
+        self.writeWorkersBox.setValue(int(self.settings['POD Settings'].get('writeWorkers', '4')))
+        self.outputFormatComboBox.setCurrentText(self.settings['POD Settings'].get('outputFormat', 'files'))
+        self.compressOutputCheckbox.setChecked(self.settings['POD Settings'].get('compressOutput', 'False') == 'True')
+        self.outputDepthComboBox.setCurrentText(self.settings['POD Settings'].get('outputDepth', 'source'))
+        self.filterComboBox.setCurrentText(self.settings['POD Settings'].get('filter', 'pod'))
+        self.percentileBox.setValue(float(self.settings['POD Settings'].get('percentile', '10')))
+        self.windowBox.setValue(int(self.settings['POD Settings'].get('window', '21')))
+        self.medianLevelsBox.setValue(int(self.settings['POD Settings'].get('medianLevels', '256')))
+        self.removeModesCheckbox.setChecked(self.settings['POD Settings'].get('removeModes', 'False') == 'True')
+        self.lowCutoffBox.setValue(float(self.settings['POD Settings'].get('lowCutoff', '0.1')))
+        self.highCutoffBox.setValue(float(self.settings['POD Settings'].get('highCutoff', '1.0')))
+        self.frameRateBox.setValue(float(self.settings['POD Settings'].get('frameRate', '15.0')))
+        self.update_filter_widgets(self.filterComboBox.currentText())
+        self.outputScalingComboBox.setCurrentText(self.settings['POD Settings'].get('outputScaling', 'clip'))
+        self.memoryBudgetBox.setValue(float(self.settings['POD Settings'].get('memoryBudget', '0')))
+        self.batchWorkersBox.setValue(int(self.settings['POD Settings'].get('batchWorkers', '1')))
+        self.podAutoBatchCheckbox.setChecked(self.settings['POD Settings'].get('autoBatches', 'False') == 'True')
+        self.resumeCheckbox.setChecked(self.settings['POD Settings'].get('resume', 'False') == 'True')
+        self.stackCacheCheckbox.setChecked(self.settings['POD Settings'].get('stackCache', 'False') == 'True')
+        self.stackCacheSizeBox.setValue(float(self.settings['POD Settings'].get('stackCacheSize', '8')))
+
         #Load Default Theme
         self.change_theme(self.settings['App Settings']['Theme'])
    
@@ -192,6 +290,33 @@ class MainWindow(Ui_MainWindow):
         self.settings['POD Settings']['flipImages'] = str(self.podFlipImageCheckbox.isChecked())
         self.settings['POD Settings']['nBatches'] = str(self.podBatchBox.value())
         self.settings['POD Settings']['cutImages'] = str(self.podCutImagesCheckbox.isChecked())
+        self.settings['POD Settings']['eigSolver'] = self.eigSolverComboBox.currentText()
+        self.settings['POD Settings']['fullSpectrum'] = str(self.fullSpectrumCheckbox.isChecked())
+        self.settings['POD Settings']['dtype'] = self.podDtypeComboBox.currentText()
+        self.settings['POD Settings']['checkPrecision'] = str(self.podCheckPrecisionCheckbox.isChecked())
+        self.settings['POD Settings']['streaming'] = str(self.streamingCheckbox.isChecked())
+        self.settings['POD Settings']['scratchFolder'] = self.scratchFolderEdit.text()
+        self.settings['POD Settings']['decodeWorkers'] = str(self.decodeWorkersBox.value())
+        self.settings['POD Settings']['decodeBackend'] = self.decodeBackendComboBox.currentText()
+        self.settings['POD Settings']['writeWorkers'] = str(self.writeWorkersBox.value())
+        self.settings['POD Settings']['outputFormat'] = self.outputFormatComboBox.currentText()
+        self.settings['POD Settings']['compressOutput'] = str(self.compressOutputCheckbox.isChecked())
+        self.settings['POD Settings']['outputDepth'] = self.outputDepthComboBox.currentText()
+        self.settings['POD Settings']['filter'] = self.filterComboBox.currentText()
+        self.settings['POD Settings']['percentile'] = str(self.percentileBox.value())
+        self.settings['POD Settings']['window'] = str(self.windowBox.value())
+        self.settings['POD Settings']['medianLevels'] = str(self.medianLevelsBox.value())
+        self.settings['POD Settings']['removeModes'] = str(self.removeModesCheckbox.isChecked())
+        self.settings['POD Settings']['lowCutoff'] = str(self.lowCutoffBox.value())
+        self.settings['POD Settings']['highCutoff'] = str(self.highCutoffBox.value())
+        self.settings['POD Settings']['frameRate'] = str(self.frameRateBox.value())
+        self.settings['POD Settings']['outputScaling'] = self.outputScalingComboBox.currentText()
+        self.settings['POD Settings']['memoryBudget'] = str(self.memoryBudgetBox.value())
+        self.settings['POD Settings']['batchWorkers'] = str(self.batchWorkersBox.value())
+        self.settings['POD Settings']['autoBatches'] = str(self.podAutoBatchCheckbox.isChecked())
+        self.settings['POD Settings']['resume'] = str(self.resumeCheckbox.isChecked())
+        self.settings['POD Settings']['stackCache'] = str(self.stackCacheCheckbox.isChecked())
+        self.settings['POD Settings']['stackCacheSize'] = str(self.stackCacheSizeBox.value())
 
         #Save the write the settings to our config file
         with open(CONFIG_PATH, 'w') as settings_file:
@@ -241,7 +366,14 @@ class MainWindow(Ui_MainWindow):
             image = imread(self.imageList[currentIm], as_gray = True)
             self.imageShape = [image.shape[0], image.shape[1]]
 
-            if self.previewCutImagesCheckbox.isChecked():
+            #Type of the images, for the batch plan
+            self.sourceDtype = imread(self.imageList[0]).dtype
+
+            if self.previewOutputCheckbox.isChecked() and self.open_output_reader():
+                #A and B frames of the saved output one after the other
+                self.imageNumber = 2*self.outputReader.frame_count('a') - 1
+
+            elif self.previewCutImagesCheckbox.isChecked():
                 self.imageNumber = (len(self.imageList)-1)*2
                 self.imageShape[0] = self.imageShape[0]//2
             
@@ -284,12 +416,44 @@ class MainWindow(Ui_MainWindow):
     def update_batch_boxes(self):
         if self.podCutImagesCheckbox.isChecked():
             self.podPairBox.setMaximum(len(self.imageList))
-            self.podImagesPerBatchLabel.setText('Images Per Batch: %i'%(self.podPairBox.value()/self.podBatchBox.value()))
-            
         else:
             self.podPairBox.setMaximum(len(self.imageList)//2)
-            self.podImagesPerBatchLabel.setText('Images Per Batch: %i'%(self.podPairBox.value()/self.podBatchBox.value()))
 
+        #The pairs are spread over the batches, so some batches can have one more
+        nPairs = self.podPairBox.value()//self.podBatchBox.value()
+        if self.podPairBox.value() % self.podBatchBox.value() == 0:
+            self.podImagesPerBatchLabel.setText('Images Per Batch: %i'%nPairs)
+        else:
+            self.podImagesPerBatchLabel.setText('Images Per Batch: %i-%i'%(nPairs, nPairs + 1))
+
+        self.update_batch_plan()
+
+    #Plan the batches with the current settings - the number of batches is picked from the memory budget 
+    #if Auto Batches is checked. Returns None if there are no images
+    def batch_plan(self, settings):
+        if not hasattr(self, 'sourceDtype') or self.podPairBox.value() == 0:
+            return None
+
+        nPixels = crop_pixels((self.yCropMaxBox.maximum(), self.xCropMaxBox.maximum()), settings['cropList'])
+        nBatches = None if self.podAutoBatchCheckbox.isChecked() else self.podBatchBox.value()
+
+        return plan_batches(settings, nPixels, self.podPairBox.value(), self.sourceDtype, settings['memoryBudget'], nBatches)
+
+    #Show the plan of the batches before the run, Auto Batches also sets the number of batches
+    def update_batch_plan(self):
+        self.podBatchBox.setEnabled(not self.podAutoBatchCheckbox.isChecked())
+
+        plan = self.batch_plan(self.pod_settings())
+        if plan is None:
+            self.batchPlanLabel.setText('Batch Plan: -')
+            self.batchPlanLabel.setEnabled(False)
+            return
+
+        if self.podAutoBatchCheckbox.isChecked():
+            self.podBatchBox.setValue(len(plan['batchSizes']))
+
+        self.batchPlanLabel.setText('Batch Plan: %s'%plan_summary(plan))
+        self.batchPlanLabel.setEnabled(True)
 
 
     def update_crop_values(self, currentIm):
@@ -318,24 +482,25 @@ class MainWindow(Ui_MainWindow):
                 self.imageNumber = 0
                 self.surprise = False
 
+            #Preview the saved output (image files or a container)
+            elif self.previewOutputCheckbox.isChecked() and self.outputReader is not None:
+                frameSet = 'ab'[num%2]
+                image = self.outputReader.read(frameSet, num//2)
+                imageName = 'SAVED_A%04d%s'%(num//2, frameSet)
+
             #Preview images from POD if we want to
             elif self.showComputedImagesCheckbox.isChecked():
                 #Select image pair
                 if num%2==1: #even images are b
                     num-=1
-                    image = np.copy(self.podRunner.D_b_filt[:, num])
+                    image = self.podRunner.output_image(self.podRunner.D_b_filt, num)
                     imageName = 'B_FILTERED_' + self.imageList[num].name
 
                 else:
-                    image = np.copy(self.podRunner.D_a_filt[:, num])
+                    image = self.podRunner.output_image(self.podRunner.D_a_filt, num)
                     imageName = 'A_FILTERED_' + self.imageList[num].name
 
-                (nx, ny) = self.podRunner.imageShape
-                image = np.reshape(image, ((nx, ny)))
-                image[image < 0] = 0  # Things below 0 are treated as zero
-            
-                #Cast to uint 
-                image = np.uint8(image)
+                #Shown with the bit depth and clipping of the saved images
                
                 #Image is already cropped so we don't need this 
 
@@ -402,11 +567,15 @@ class MainWindow(Ui_MainWindow):
                                 self.yCropMinBox.value(),
                                 self.yCropMaxBox.value()]
         settings['saveCrop'] = self.cutApplyCropCheckbox.isChecked() 
+        settings['writeWorkers'] = self.writeWorkersBox.value()
+        settings['outputFormat'] = self.outputFormatComboBox.currentText()
+        settings['compressOutput'] = self.compressOutputCheckbox.isChecked()
 
         self.imageCutter = ImageCutter(self.imageList, self.loadFolder, settings)
 
         #Connect the signal to updating progress bar
         self.imageCutter.saveUpdateSignal.connect(self.update_cut_save_bar)    
+        self.imageCutter.finished.connect(lambda: self.show_stage_summary(self.imageCutter))
 
         if self.cuttingSaveFolderEdit.text()=='':
             self.imageCutter.saveFolder = self.loadFolder / 'cut'
@@ -424,6 +593,14 @@ class MainWindow(Ui_MainWindow):
         self.cuttingSaveProgressBar.setFormat(label)
 
 
+    #Times of the stages when a run finishes, every stage is in the run log of the save folder
+    def show_stage_summary(self, runner):
+        #The deviation of float32 results is only known if it was checked
+        if getattr(runner, 'maxDeviation', None) is not None:
+            self.statusbar.showMessage('Max deviation from float64: %.3g - Stages: %s'%(runner.maxDeviation, runner.stage_summary()))
+        else:
+            self.statusbar.showMessage('Stages: %s'%runner.stage_summary())
+
     def update_cut_folder(self, finished):
         if finished:
             self.showCutImages = True 
@@ -431,15 +608,58 @@ class MainWindow(Ui_MainWindow):
 
       
 
-    def compute_pod_matrices(self):
+    #Settings of the engines from the widgets (without the batches)
+    def pod_settings(self):
         #Collect settings
         settings = {} 
         settings['nModes'] = self.podModeBox.value() 
-        settings['nPairs'] = self.podPairBox.value()//self.podBatchBox.value()
         settings['flipImage'] = self.podFlipImageCheckbox.isChecked() 
+        settings['dtype'] = self.podDtypeComboBox.currentText()
+
+        #Report how far float32 results are from float64, this projects every tile twice
+        settings['checkPrecision'] = self.podCheckPrecisionCheckbox.isChecked()
 
         settings['cutImages'] = self.podCutImagesCheckbox.isChecked()
-        settings['nBatches'] = self.podBatchBox.value()
+
+        #Engine settings
+        settings['eigSolver'] = self.eigSolverComboBox.currentText()
+        settings['fullSpectrum'] = self.fullSpectrumCheckbox.isChecked()
+        settings['streaming'] = self.streamingCheckbox.isChecked()
+        settings['decodeWorkers'] = self.decodeWorkersBox.value()
+        settings['decodeBackend'] = self.decodeBackendComboBox.currentText()
+        settings['writeWorkers'] = self.writeWorkersBox.value()
+        settings['outputFormat'] = self.outputFormatComboBox.currentText()
+        settings['compressOutput'] = self.compressOutputCheckbox.isChecked()
+        settings['outputDepth'] = self.outputDepthComboBox.currentText()
+        settings['outputScaling'] = self.outputScalingComboBox.currentText()
+
+        #Keep the projection on the leading modes of the batch in memory, so the number of modes can be changed after computing
+        settings['keepCoefficients'] = True
+
+        #Memory budget in bytes, 0 is no limit
+        if self.memoryBudgetBox.value() == 0:
+            settings['memoryBudget'] = None
+        else:
+            settings['memoryBudget'] = self.memoryBudgetBox.value() * 1024**3
+
+        #Processes filtering batches at the same time, the memory budget is split between them
+        settings['batchWorkers'] = self.batchWorkersBox.value()
+
+        #Skip the batches a run that was stopped already saved
+        settings['resume'] = self.resumeCheckbox.isChecked()
+
+        #Memory map the data matrices in the scratch folder (relative to the workspace) if we have one
+        if self.scratchFolderEdit.text() == '':
+            settings['scratchFolder'] = None
+        else:
+            settings['scratchFolder'] = self.loadFolder / self.scratchFolderEdit.text()
+
+        #Cache of decoded images, shared between workspaces (and with the POD script for a batch of the same images)
+        if self.stackCacheCheckbox.isChecked():
+            settings['cacheFolder'] = DEFAULT_CACHE_FOLDER
+            settings['cacheSize'] = self.stackCacheSizeBox.value() * 1024**3
+        else:
+            settings['cacheFolder'] = None
 
         #Crop list - [X1, X2, Y1, Y2]
         settings['cropList'] = [self.xCropMinBox.value(), 
@@ -447,25 +667,88 @@ class MainWindow(Ui_MainWindow):
                                 self.yCropMinBox.value(),
                                 self.yCropMaxBox.value()]
 
-        #Create podRunner object
-        self.podRunner = PODRunner(self.imageList, self.loadFolder, settings) 
+        #Settings of the filter
+        if self.filterComboBox.currentText() in SLIDING_BACKGROUND_LIST:
+            settings['background'] = self.filterComboBox.currentText()
+            settings['window'] = self.windowBox.value()
+            settings['medianLevels'] = self.medianLevelsBox.value()
+        elif self.filterComboBox.currentText() in FREQUENCY_FILTER_LIST:
+            settings['frequencyFilter'] = self.filterComboBox.currentText()
+            settings['lowCutoff'] = self.lowCutoffBox.value()
+            settings['highCutoff'] = self.highCutoffBox.value()
+            settings['frameRate'] = self.frameRateBox.value()
+            settings['removeModes'] = self.removeModesCheckbox.isChecked()
+        elif self.filterComboBox.currentText() != 'pod':
+            settings['background'] = self.filterComboBox.currentText()
+            settings['percentile'] = self.percentileBox.value()
+
+        return settings
+
+    def compute_pod_matrices(self):
+        settings = self.pod_settings()
+
+        #Pairs are spread over the batches so none are dropped
+        plan = self.batch_plan(settings)
+        if plan is None:
+            self.statusbar.showMessage('No image pairs to filter')
+            return
+
+        settings['batchSizes'] = plan['batchSizes']
+        settings['nBatches'] = len(plan['batchSizes'])
+        settings['nPairs'] = max(plan['batchSizes'])
+        settings['memoryBudget'] = plan['memoryBudget']
+        self.batchPlanLabel.setText('Batch Plan: %s'%plan_summary(plan))
+
+        #Create podRunner object - background filters use the same runner interface
+        if self.filterComboBox.currentText() == 'pod':
+            self.podRunner = PODRunner(self.imageList, self.loadFolder, settings)
+        elif self.filterComboBox.currentText() in SLIDING_BACKGROUND_LIST:
+            self.podRunner = SlidingBackgroundRunner(self.imageList, self.loadFolder, settings)
+        elif self.filterComboBox.currentText() in FREQUENCY_FILTER_LIST:
+            self.podRunner = FrequencyRunner(self.imageList, self.loadFolder, settings)
+        else:
+            self.podRunner = BackgroundRunner(self.imageList, self.loadFolder, settings) 
 
 
         #Connect signals to functions
         self.podRunner.updateSignal.connect(self.update_pod_bar)
         self.podRunner.finishedComputation.connect(self.on_finished_computing)
+        self.podRunner.finishedSaving.connect(self.on_finished_saving)
+        self.podRunner.finished.connect(lambda: self.show_stage_summary(self.podRunner))
 
         self.podRunButton.setDisabled(True)
 
         #Set the function to compute matrix and start
         self.podRunner.function = 'save'
         
+        self.podRunner.saveFolder = self.pod_output_folder()
+
+        self.podRunner.start()
+
+    #Folder the POD images are saved in
+    def pod_output_folder(self):
         if self.podSaveFolderEdit.text() == '':
-            self.podRunner.saveFolder = self.loadFolder / 'pod_images'
+            return self.loadFolder / 'pod_images'
         else:
-            self.podRunner.saveFolder = self.loadFolder / self.podSaveFolderEdit.text() 
+            return self.loadFolder / self.podSaveFolderEdit.text() 
 
-        self.podRunner.start()
+    #Open the saved POD output for the preview, returns False if there isn't any
+    def open_output_reader(self):
+        if self.outputReader is not None:
+            self.outputReader.close()
+
+        try:
+            self.outputReader = open_container(self.pod_output_folder())
+        except Exception as e:
+            self.outputReader = None
+            self.statusbar.showMessage('Could not open saved output: %s'%e)
+            return False
+
+        if self.outputReader is None:
+            self.statusbar.showMessage('No saved output in %s'%self.pod_output_folder())
+            return False
+
+        return True
 
     def continue_pod_runner(self):
         self.podRunner.continue_pod = True 
@@ -480,9 +763,57 @@ class MainWindow(Ui_MainWindow):
             self.showComputedImagesCheckbox.setEnabled(True)
             self.showComputedImagesCheckbox.setChecked(True)
             self.get_images()
-        
+
+            #The number of modes may have changed while computing (the runner returns right after the signal)
+            if self.podModeBox.value() != self.podRunner.nModes:
+                self.podRunner.wait()
+                self.refilter_pod_images()
+
         self.podRunButton.setEnabled(True)
 
+    #A failed run says why on the progress bar, it can be continued (or run again) once the problem is fixed
+    def on_finished_saving(self, finished):
+        if not finished:
+            self.podRunButton.setEnabled(True)
+            self.podContinueButton.setEnabled(self.podRunner.residentBatch is not None)
+
+    #Only show the settings of the selected filter
+    def update_filter_widgets(self, filterType):
+        self.percentileBox.setEnabled(filterType == 'percentile')
+        self.percentileLabel.setEnabled(filterType == 'percentile')
+        self.windowBox.setEnabled(filterType in SLIDING_BACKGROUND_LIST)
+        self.windowLabel.setEnabled(filterType in SLIDING_BACKGROUND_LIST)
+        self.medianLevelsBox.setEnabled(filterType == 'sliding-median')
+        self.medianLevelsLabel.setEnabled(filterType == 'sliding-median')
+        self.removeModesCheckbox.setEnabled(filterType in FREQUENCY_FILTER_LIST)
+        self.lowCutoffBox.setEnabled(filterType in FREQUENCY_FILTER_LIST)
+        self.lowCutoffLabel.setEnabled(filterType in FREQUENCY_FILTER_LIST)
+        self.highCutoffBox.setEnabled(filterType == 'band-stop')
+        self.highCutoffLabel.setEnabled(filterType == 'band-stop')
+        self.frameRateBox.setEnabled(filterType in FREQUENCY_FILTER_LIST)
+        self.frameRateLabel.setEnabled(filterType in FREQUENCY_FILTER_LIST)
+        self.podModeBox.setEnabled(filterType == 'pod' or (filterType in FREQUENCY_FILTER_LIST and self.removeModesCheckbox.isChecked()))
+
+    #Remove every cached image stack
+    def clear_stack_cache(self):
+        StackCache(DEFAULT_CACHE_FOLDER).clear()
+        self.statusbar.showMessage('Cleared decoded image cache')
+
+    #Update the computed images with a new number of modes (cheap, the temporal basis is kept)
+    def refilter_pod_images(self):
+        #Only if we have computed images and the runner isn't working on them
+        if not hasattr(self, 'podRunner') or self.podRunner.residentBatch is None or self.podRunner.isRunning():
+            return
+
+        #More modes than were kept, so the batch is computed again
+        if not self.podRunner.refilter(self.podModeBox.value()):
+            self.statusbar.showMessage('Only %i modes were kept - computing the batch again to remove %i modes'%(self.podRunner.keepModes, self.podModeBox.value()))
+            self.compute_pod_matrices()
+            return
+
+        if self.showComputedImagesCheckbox.isChecked():
+            self.update_image(self.imageScrollBar.value())
+
     #Functions to update POD progress bars
     def update_pod_bar(self, percent, label):
         #Set the percentage
@@ -14,11 +14,11 @@ from PyQt5 import QtCore, QtGui, QtWidgets
 class Ui_MainWindow(object):
     def setupUi(self, MainWindow):
         MainWindow.setObjectName("MainWindow")
-        MainWindow.resize(1017, 653)
+        MainWindow.resize(1017, 853)
         self.centralwidget = QtWidgets.QWidget(MainWindow)
         self.centralwidget.setObjectName("centralwidget")
         self.mainTabWidget = QtWidgets.QTabWidget(self.centralwidget)
-        self.mainTabWidget.setGeometry(QtCore.QRect(10, 0, 991, 601))
+        self.mainTabWidget.setGeometry(QtCore.QRect(10, 0, 991, 801))
         self.mainTabWidget.setObjectName("mainTabWidget")
         self.podTab = QtWidgets.QWidget()
         self.podTab.setObjectName("podTab")
@@ -43,7 +43,7 @@ class Ui_MainWindow(object):
         self.loadFolderButton.setObjectName("loadFolderButton")
         self.cuttingGroup = QtWidgets.QGroupBox(self.podTab)
         self.cuttingGroup.setEnabled(False)
-        self.cuttingGroup.setGeometry(QtCore.QRect(10, 310, 351, 121))
+        self.cuttingGroup.setGeometry(QtCore.QRect(10, 360, 351, 121))
         self.cuttingGroup.setObjectName("cuttingGroup")
         self.cuttingSaveButton = QtWidgets.QPushButton(self.cuttingGroup)
         self.cuttingSaveButton.setEnabled(False)
@@ -72,6 +72,12 @@ class Ui_MainWindow(object):
         self.imageResolutionLabel.setEnabled(False)
         self.imageResolutionLabel.setGeometry(QtCore.QRect(380, 530, 601, 21))
         self.imageResolutionLabel.setObjectName("imageResolutionLabel")
+        self.batchPlanLabel = QtWidgets.QLabel(self.podTab)
+        self.batchPlanLabel.setEnabled(False)
+        self.batchPlanLabel.setGeometry(QtCore.QRect(380, 560, 601, 42))
+        self.batchPlanLabel.setAlignment(QtCore.Qt.AlignLeading|QtCore.Qt.AlignLeft|QtCore.Qt.AlignTop)
+        self.batchPlanLabel.setWordWrap(True)
+        self.batchPlanLabel.setObjectName("batchPlanLabel")
         self.imageExtensionLabel = QtWidgets.QLabel(self.podTab)
         self.imageExtensionLabel.setGeometry(QtCore.QRect(10, 40, 101, 21))
         self.imageExtensionLabel.setObjectName("imageExtensionLabel")
@@ -81,7 +87,7 @@ class Ui_MainWindow(object):
         self.imageNumberLabel.setObjectName("imageNumberLabel")
         self.podFilterGroup = QtWidgets.QGroupBox(self.podTab)
         self.podFilterGroup.setEnabled(False)
-        self.podFilterGroup.setGeometry(QtCore.QRect(10, 440, 351, 121))
+        self.podFilterGroup.setGeometry(QtCore.QRect(10, 490, 351, 271))
         self.podFilterGroup.setObjectName("podFilterGroup")
         self.podRunButton = QtWidgets.QPushButton(self.podFilterGroup)
         self.podRunButton.setEnabled(False)
@@ -108,6 +114,73 @@ class Ui_MainWindow(object):
         self.showComputedImagesCheckbox.setEnabled(False)
         self.showComputedImagesCheckbox.setGeometry(QtCore.QRect(190, 30, 151, 21))
         self.showComputedImagesCheckbox.setObjectName("showComputedImagesCheckbox")
+        self.previewOutputCheckbox = QtWidgets.QCheckBox(self.podFilterGroup)
+        self.previewOutputCheckbox.setGeometry(QtCore.QRect(10, 120, 331, 21))
+        self.previewOutputCheckbox.setObjectName("previewOutputCheckbox")
+        self.filterLabel = QtWidgets.QLabel(self.podFilterGroup)
+        self.filterLabel.setGeometry(QtCore.QRect(10, 150, 41, 21))
+        self.filterLabel.setObjectName("filterLabel")
+        self.filterComboBox = QtWidgets.QComboBox(self.podFilterGroup)
+        self.filterComboBox.setGeometry(QtCore.QRect(60, 150, 111, 22))
+        self.filterComboBox.setObjectName("filterComboBox")
+        self.percentileLabel = QtWidgets.QLabel(self.podFilterGroup)
+        self.percentileLabel.setGeometry(QtCore.QRect(180, 150, 71, 21))
+        self.percentileLabel.setObjectName("percentileLabel")
+        self.percentileBox = QtWidgets.QDoubleSpinBox(self.podFilterGroup)
+        self.percentileBox.setGeometry(QtCore.QRect(260, 150, 81, 22))
+        self.percentileBox.setMaximum(100.0)
+        self.percentileBox.setProperty("value", 10.0)
+        self.percentileBox.setObjectName("percentileBox")
+        self.windowLabel = QtWidgets.QLabel(self.podFilterGroup)
+        self.windowLabel.setGeometry(QtCore.QRect(180, 180, 71, 21))
+        self.windowLabel.setObjectName("windowLabel")
+        self.windowBox = QtWidgets.QSpinBox(self.podFilterGroup)
+        self.windowBox.setGeometry(QtCore.QRect(260, 180, 81, 22))
+        self.windowBox.setMinimum(1)
+        self.windowBox.setMaximum(9999)
+        self.windowBox.setSingleStep(2)
+        self.windowBox.setProperty("value", 21)
+        self.windowBox.setObjectName("windowBox")
+        self.medianLevelsLabel = QtWidgets.QLabel(self.podFilterGroup)
+        self.medianLevelsLabel.setGeometry(QtCore.QRect(180, 240, 71, 21))
+        self.medianLevelsLabel.setObjectName("medianLevelsLabel")
+        self.medianLevelsBox = QtWidgets.QSpinBox(self.podFilterGroup)
+        self.medianLevelsBox.setGeometry(QtCore.QRect(260, 240, 81, 22))
+        self.medianLevelsBox.setMinimum(2)
+        self.medianLevelsBox.setMaximum(65536)
+        self.medianLevelsBox.setProperty("value", 256)
+        self.medianLevelsBox.setObjectName("medianLevelsBox")
+        self.removeModesCheckbox = QtWidgets.QCheckBox(self.podFilterGroup)
+        self.removeModesCheckbox.setGeometry(QtCore.QRect(10, 180, 161, 21))
+        self.removeModesCheckbox.setObjectName("removeModesCheckbox")
+        self.lowCutoffLabel = QtWidgets.QLabel(self.podFilterGroup)
+        self.lowCutoffLabel.setGeometry(QtCore.QRect(10, 210, 41, 21))
+        self.lowCutoffLabel.setObjectName("lowCutoffLabel")
+        self.lowCutoffBox = QtWidgets.QDoubleSpinBox(self.podFilterGroup)
+        self.lowCutoffBox.setGeometry(QtCore.QRect(60, 210, 111, 22))
+        self.lowCutoffBox.setDecimals(3)
+        self.lowCutoffBox.setMaximum(100000.0)
+        self.lowCutoffBox.setProperty("value", 0.1)
+        self.lowCutoffBox.setObjectName("lowCutoffBox")
+        self.highCutoffLabel = QtWidgets.QLabel(self.podFilterGroup)
+        self.highCutoffLabel.setGeometry(QtCore.QRect(180, 210, 71, 21))
+        self.highCutoffLabel.setObjectName("highCutoffLabel")
+        self.highCutoffBox = QtWidgets.QDoubleSpinBox(self.podFilterGroup)
+        self.highCutoffBox.setGeometry(QtCore.QRect(260, 210, 81, 22))
+        self.highCutoffBox.setDecimals(3)
+        self.highCutoffBox.setMaximum(100000.0)
+        self.highCutoffBox.setProperty("value", 1.0)
+        self.highCutoffBox.setObjectName("highCutoffBox")
+        self.frameRateLabel = QtWidgets.QLabel(self.podFilterGroup)
+        self.frameRateLabel.setGeometry(QtCore.QRect(10, 240, 41, 21))
+        self.frameRateLabel.setObjectName("frameRateLabel")
+        self.frameRateBox = QtWidgets.QDoubleSpinBox(self.podFilterGroup)
+        self.frameRateBox.setGeometry(QtCore.QRect(60, 240, 111, 22))
+        self.frameRateBox.setDecimals(3)
+        self.frameRateBox.setMinimum(0.001)
+        self.frameRateBox.setMaximum(100000.0)
+        self.frameRateBox.setProperty("value", 15.0)
+        self.frameRateBox.setObjectName("frameRateBox")
         self.verticalLayoutWidget = QtWidgets.QWidget(self.podTab)
         self.verticalLayoutWidget.setGeometry(QtCore.QRect(380, 10, 601, 451))
         self.verticalLayoutWidget.setObjectName("verticalLayoutWidget")
@@ -116,10 +189,10 @@ class Ui_MainWindow(object):
         self.plotLayout.setObjectName("plotLayout")
         self.podSettingsBox = QtWidgets.QGroupBox(self.podTab)
         self.podSettingsBox.setEnabled(True)
-        self.podSettingsBox.setGeometry(QtCore.QRect(10, 70, 351, 231))
+        self.podSettingsBox.setGeometry(QtCore.QRect(10, 70, 351, 281))
         self.podSettingsBox.setObjectName("podSettingsBox")
         self.podCropBox = QtWidgets.QGroupBox(self.podSettingsBox)
-        self.podCropBox.setGeometry(QtCore.QRect(10, 130, 331, 91))
+        self.podCropBox.setGeometry(QtCore.QRect(10, 180, 331, 91))
         self.podCropBox.setObjectName("podCropBox")
         self.xCropLabel = QtWidgets.QLabel(self.podCropBox)
         self.xCropLabel.setGeometry(QtCore.QRect(10, 30, 53, 21))
@@ -173,12 +246,130 @@ class Ui_MainWindow(object):
         self.podImagesPerBatchLabel = QtWidgets.QLabel(self.podSettingsBox)
         self.podImagesPerBatchLabel.setGeometry(QtCore.QRect(210, 90, 131, 21))
         self.podImagesPerBatchLabel.setObjectName("podImagesPerBatchLabel")
+        self.podDtypeLabel = QtWidgets.QLabel(self.podSettingsBox)
+        self.podDtypeLabel.setGeometry(QtCore.QRect(10, 120, 121, 21))
+        self.podDtypeLabel.setObjectName("podDtypeLabel")
+        self.podDtypeComboBox = QtWidgets.QComboBox(self.podSettingsBox)
+        self.podDtypeComboBox.setGeometry(QtCore.QRect(130, 120, 71, 23))
+        self.podDtypeComboBox.setObjectName("podDtypeComboBox")
+        self.podAutoBatchCheckbox = QtWidgets.QCheckBox(self.podSettingsBox)
+        self.podAutoBatchCheckbox.setGeometry(QtCore.QRect(210, 150, 131, 21))
+        self.podAutoBatchCheckbox.setObjectName("podAutoBatchCheckbox")
+        self.podCheckPrecisionCheckbox = QtWidgets.QCheckBox(self.podSettingsBox)
+        self.podCheckPrecisionCheckbox.setGeometry(QtCore.QRect(210, 120, 131, 21))
+        self.podCheckPrecisionCheckbox.setObjectName("podCheckPrecisionCheckbox")
         self.loadFolderEdit = QtWidgets.QLineEdit(self.podTab)
         self.loadFolderEdit.setEnabled(True)
         self.loadFolderEdit.setGeometry(QtCore.QRect(130, 10, 201, 22))
         self.loadFolderEdit.setReadOnly(True)
         self.loadFolderEdit.setObjectName("loadFolderEdit")
         self.mainTabWidget.addTab(self.podTab, "")
+        self.engineTab = QtWidgets.QWidget()
+        self.engineTab.setObjectName("engineTab")
+        self.podEngineBox = QtWidgets.QGroupBox(self.engineTab)
+        self.podEngineBox.setGeometry(QtCore.QRect(10, 10, 471, 611))
+        self.podEngineBox.setObjectName("podEngineBox")
+        self.podEngineLayout = QtWidgets.QFormLayout(self.podEngineBox)
+        self.podEngineLayout.setObjectName("podEngineLayout")
+        self.eigSolverLabel = QtWidgets.QLabel(self.podEngineBox)
+        self.eigSolverLabel.setObjectName("eigSolverLabel")
+        self.podEngineLayout.setWidget(0, QtWidgets.QFormLayout.LabelRole, self.eigSolverLabel)
+        self.eigSolverComboBox = QtWidgets.QComboBox(self.podEngineBox)
+        self.eigSolverComboBox.setObjectName("eigSolverComboBox")
+        self.podEngineLayout.setWidget(0, QtWidgets.QFormLayout.FieldRole, self.eigSolverComboBox)
+        self.fullSpectrumCheckbox = QtWidgets.QCheckBox(self.podEngineBox)
+        self.fullSpectrumCheckbox.setObjectName("fullSpectrumCheckbox")
+        self.podEngineLayout.setWidget(1, QtWidgets.QFormLayout.FieldRole, self.fullSpectrumCheckbox)
+        self.streamingCheckbox = QtWidgets.QCheckBox(self.podEngineBox)
+        self.streamingCheckbox.setObjectName("streamingCheckbox")
+        self.podEngineLayout.setWidget(2, QtWidgets.QFormLayout.FieldRole, self.streamingCheckbox)
+        self.scratchFolderLabel = QtWidgets.QLabel(self.podEngineBox)
+        self.scratchFolderLabel.setObjectName("scratchFolderLabel")
+        self.podEngineLayout.setWidget(3, QtWidgets.QFormLayout.LabelRole, self.scratchFolderLabel)
+        self.scratchFolderEdit = QtWidgets.QLineEdit(self.podEngineBox)
+        self.scratchFolderEdit.setObjectName("scratchFolderEdit")
+        self.podEngineLayout.setWidget(3, QtWidgets.QFormLayout.FieldRole, self.scratchFolderEdit)
+        self.decodeWorkersLabel = QtWidgets.QLabel(self.podEngineBox)
+        self.decodeWorkersLabel.setObjectName("decodeWorkersLabel")
+        self.podEngineLayout.setWidget(4, QtWidgets.QFormLayout.LabelRole, self.decodeWorkersLabel)
+        self.decodeWorkersBox = QtWidgets.QSpinBox(self.podEngineBox)
+        self.decodeWorkersBox.setMinimum(1)
+        self.decodeWorkersBox.setMaximum(64)
+        self.decodeWorkersBox.setProperty("value", 4)
+        self.decodeWorkersBox.setObjectName("decodeWorkersBox")
+        self.podEngineLayout.setWidget(4, QtWidgets.QFormLayout.FieldRole, self.decodeWorkersBox)
+        self.decodeBackendLabel = QtWidgets.QLabel(self.podEngineBox)
+        self.decodeBackendLabel.setObjectName("decodeBackendLabel")
+        self.podEngineLayout.setWidget(5, QtWidgets.QFormLayout.LabelRole, self.decodeBackendLabel)
+        self.decodeBackendComboBox = QtWidgets.QComboBox(self.podEngineBox)
+        self.decodeBackendComboBox.setObjectName("decodeBackendComboBox")
+        self.podEngineLayout.setWidget(5, QtWidgets.QFormLayout.FieldRole, self.decodeBackendComboBox)
+        self.writeWorkersLabel = QtWidgets.QLabel(self.podEngineBox)
+        self.writeWorkersLabel.setObjectName("writeWorkersLabel")
+        self.podEngineLayout.setWidget(6, QtWidgets.QFormLayout.LabelRole, self.writeWorkersLabel)
+        self.writeWorkersBox = QtWidgets.QSpinBox(self.podEngineBox)
+        self.writeWorkersBox.setMinimum(1)
+        self.writeWorkersBox.setMaximum(64)
+        self.writeWorkersBox.setProperty("value", 4)
+        self.writeWorkersBox.setObjectName("writeWorkersBox")
+        self.podEngineLayout.setWidget(6, QtWidgets.QFormLayout.FieldRole, self.writeWorkersBox)
+        self.outputFormatLabel = QtWidgets.QLabel(self.podEngineBox)
+        self.outputFormatLabel.setObjectName("outputFormatLabel")
+        self.podEngineLayout.setWidget(7, QtWidgets.QFormLayout.LabelRole, self.outputFormatLabel)
+        self.outputFormatComboBox = QtWidgets.QComboBox(self.podEngineBox)
+        self.outputFormatComboBox.setObjectName("outputFormatComboBox")
+        self.podEngineLayout.setWidget(7, QtWidgets.QFormLayout.FieldRole, self.outputFormatComboBox)
+        self.compressOutputCheckbox = QtWidgets.QCheckBox(self.podEngineBox)
+        self.compressOutputCheckbox.setObjectName("compressOutputCheckbox")
+        self.podEngineLayout.setWidget(8, QtWidgets.QFormLayout.FieldRole, self.compressOutputCheckbox)
+        self.outputDepthLabel = QtWidgets.QLabel(self.podEngineBox)
+        self.outputDepthLabel.setObjectName("outputDepthLabel")
+        self.podEngineLayout.setWidget(9, QtWidgets.QFormLayout.LabelRole, self.outputDepthLabel)
+        self.outputDepthComboBox = QtWidgets.QComboBox(self.podEngineBox)
+        self.outputDepthComboBox.setObjectName("outputDepthComboBox")
+        self.podEngineLayout.setWidget(9, QtWidgets.QFormLayout.FieldRole, self.outputDepthComboBox)
+        self.outputScalingLabel = QtWidgets.QLabel(self.podEngineBox)
+        self.outputScalingLabel.setObjectName("outputScalingLabel")
+        self.podEngineLayout.setWidget(10, QtWidgets.QFormLayout.LabelRole, self.outputScalingLabel)
+        self.outputScalingComboBox = QtWidgets.QComboBox(self.podEngineBox)
+        self.outputScalingComboBox.setObjectName("outputScalingComboBox")
+        self.podEngineLayout.setWidget(10, QtWidgets.QFormLayout.FieldRole, self.outputScalingComboBox)
+        self.memoryBudgetLabel = QtWidgets.QLabel(self.podEngineBox)
+        self.memoryBudgetLabel.setObjectName("memoryBudgetLabel")
+        self.podEngineLayout.setWidget(11, QtWidgets.QFormLayout.LabelRole, self.memoryBudgetLabel)
+        self.memoryBudgetBox = QtWidgets.QDoubleSpinBox(self.podEngineBox)
+        self.memoryBudgetBox.setMaximum(4096.0)
+        self.memoryBudgetBox.setObjectName("memoryBudgetBox")
+        self.podEngineLayout.setWidget(11, QtWidgets.QFormLayout.FieldRole, self.memoryBudgetBox)
+        self.batchWorkersLabel = QtWidgets.QLabel(self.podEngineBox)
+        self.batchWorkersLabel.setObjectName("batchWorkersLabel")
+        self.podEngineLayout.setWidget(12, QtWidgets.QFormLayout.LabelRole, self.batchWorkersLabel)
+        self.batchWorkersBox = QtWidgets.QSpinBox(self.podEngineBox)
+        self.batchWorkersBox.setMinimum(1)
+        self.batchWorkersBox.setMaximum(256)
+        self.batchWorkersBox.setProperty("value", 1)
+        self.batchWorkersBox.setObjectName("batchWorkersBox")
+        self.podEngineLayout.setWidget(12, QtWidgets.QFormLayout.FieldRole, self.batchWorkersBox)
+        self.resumeCheckbox = QtWidgets.QCheckBox(self.podEngineBox)
+        self.resumeCheckbox.setObjectName("resumeCheckbox")
+        self.podEngineLayout.setWidget(13, QtWidgets.QFormLayout.FieldRole, self.resumeCheckbox)
+        self.stackCacheCheckbox = QtWidgets.QCheckBox(self.podEngineBox)
+        self.stackCacheCheckbox.setChecked(False)
+        self.stackCacheCheckbox.setObjectName("stackCacheCheckbox")
+        self.podEngineLayout.setWidget(14, QtWidgets.QFormLayout.FieldRole, self.stackCacheCheckbox)
+        self.stackCacheSizeLabel = QtWidgets.QLabel(self.podEngineBox)
+        self.stackCacheSizeLabel.setObjectName("stackCacheSizeLabel")
+        self.podEngineLayout.setWidget(15, QtWidgets.QFormLayout.LabelRole, self.stackCacheSizeLabel)
+        self.stackCacheSizeBox = QtWidgets.QDoubleSpinBox(self.podEngineBox)
+        self.stackCacheSizeBox.setMinimum(0.1)
+        self.stackCacheSizeBox.setMaximum(4096.0)
+        self.stackCacheSizeBox.setProperty("value", 8.0)
+        self.stackCacheSizeBox.setObjectName("stackCacheSizeBox")
+        self.podEngineLayout.setWidget(15, QtWidgets.QFormLayout.FieldRole, self.stackCacheSizeBox)
+        self.clearStackCacheButton = QtWidgets.QPushButton(self.podEngineBox)
+        self.clearStackCacheButton.setObjectName("clearStackCacheButton")
+        self.podEngineLayout.setWidget(16, QtWidgets.QFormLayout.FieldRole, self.clearStackCacheButton)
+        self.mainTabWidget.addTab(self.engineTab, "")
         self.openPIVClientTab = QtWidgets.QWidget()
         self.openPIVClientTab.setObjectName("openPIVClientTab")
         self.mainTabWidget.addTab(self.openPIVClientTab, "")
@@ -233,6 +424,7 @@ class Ui_MainWindow(object):
         self.previewCutImagesCheckbox.setText(_translate("MainWindow", "Preview Cut Images"))
         self.cutApplyCropCheckbox.setText(_translate("MainWindow", "Apply Crop"))
         self.imageResolutionLabel.setText(_translate("MainWindow", "Image Resolution: 0x0"))
+        self.batchPlanLabel.setText(_translate("MainWindow", "Batch Plan: -"))
         self.imageExtensionLabel.setText(_translate("MainWindow", "Image Extension"))
         self.imageNumberLabel.setText(_translate("MainWindow", "Viewing Image: - of -, Name: -"))
         self.podFilterGroup.setTitle(_translate("MainWindow", "POD Filter"))
@@ -243,6 +435,25 @@ class Ui_MainWindow(object):
         self.podSaveFolderEdit.setText(_translate("MainWindow", "pod_images"))
         self.podSaveFolderEdit.setPlaceholderText(_translate("MainWindow", "pod_images"))
         self.showComputedImagesCheckbox.setText(_translate("MainWindow", "Preview Images"))
+        self.previewOutputCheckbox.setText(_translate("MainWindow", "Preview Saved Output"))
+        self.filterLabel.setText(_translate("MainWindow", "Filter"))
+        self.percentileLabel.setToolTip(_translate("MainWindow", "Exact over the first 256 frames (fewer for large frames), approximated with the P-square estimate for longer image lists"))
+        self.percentileLabel.setText(_translate("MainWindow", "Percentile"))
+        self.windowLabel.setToolTip(_translate("MainWindow", "Frames in the sliding window centred on every image"))
+        self.windowLabel.setText(_translate("MainWindow", "Window"))
+        self.medianLevelsLabel.setToolTip(_translate("MainWindow", "Levels of the sliding median, fewer than the values in the images quantize it"))
+        self.medianLevelsLabel.setText(_translate("MainWindow", "Levels"))
+        self.removeModesCheckbox.setToolTip(_translate("MainWindow", "Remove the POD modes before the frequency filter"))
+        self.removeModesCheckbox.setText(_translate("MainWindow", "Remove modes first"))
+        self.lowCutoffLabel.setText(_translate("MainWindow", "Low"))
+        self.lowCutoffBox.setToolTip(_translate("MainWindow", "High-pass cutoff, or start of the band-stop"))
+        self.lowCutoffBox.setSuffix(_translate("MainWindow", " Hz"))
+        self.highCutoffLabel.setText(_translate("MainWindow", "High"))
+        self.highCutoffBox.setToolTip(_translate("MainWindow", "End of the band-stop"))
+        self.highCutoffBox.setSuffix(_translate("MainWindow", " Hz"))
+        self.frameRateLabel.setText(_translate("MainWindow", "Rate"))
+        self.frameRateBox.setToolTip(_translate("MainWindow", "Rate of the image pairs"))
+        self.frameRateBox.setSuffix(_translate("MainWindow", " Hz"))
         self.podSettingsBox.setTitle(_translate("MainWindow", "POD Settings"))
         self.podCropBox.setTitle(_translate("MainWindow", "Crop"))
         self.xCropLabel.setText(_translate("MainWindow", "X"))
@@ -254,7 +465,35 @@ class Ui_MainWindow(object):
         self.podCutImagesCheckbox.setText(_translate("MainWindow", "Cut Images"))
         self.podBatchLabel.setText(_translate("MainWindow", "Number of Batches"))
         self.podImagesPerBatchLabel.setText(_translate("MainWindow", "Images Per Batch: 0"))
+        self.podDtypeLabel.setText(_translate("MainWindow", "Precision"))
+        self.podAutoBatchCheckbox.setToolTip(_translate("MainWindow", "Use the fewest batches whose predicted memory fits the memory budget (or half the RAM)"))
+        self.podAutoBatchCheckbox.setText(_translate("MainWindow", "Auto Batches"))
+        self.podCheckPrecisionCheckbox.setToolTip(_translate("MainWindow", "Report the largest difference of float32 results from float64 (projects every tile twice)"))
+        self.podCheckPrecisionCheckbox.setText(_translate("MainWindow", "Check Precision"))
         self.mainTabWidget.setTabText(self.mainTabWidget.indexOf(self.podTab), _translate("MainWindow", "POD Filter"))
+        self.podEngineBox.setTitle(_translate("MainWindow", "POD Engine"))
+        self.eigSolverLabel.setText(_translate("MainWindow", "Eigen Solver"))
+        self.fullSpectrumCheckbox.setText(_translate("MainWindow", "Compute Full Eigenvalue Spectrum"))
+        self.streamingCheckbox.setText(_translate("MainWindow", "Out-of-Core (Stream Data Matrices to Disk)"))
+        self.scratchFolderLabel.setText(_translate("MainWindow", "Scratch Folder"))
+        self.scratchFolderEdit.setPlaceholderText(_translate("MainWindow", "Keep data matrices in RAM"))
+        self.decodeWorkersLabel.setText(_translate("MainWindow", "Decode Workers"))
+        self.decodeBackendLabel.setText(_translate("MainWindow", "Decode Backend"))
+        self.writeWorkersLabel.setText(_translate("MainWindow", "Write Workers"))
+        self.outputFormatLabel.setText(_translate("MainWindow", "Output Format"))
+        self.compressOutputCheckbox.setText(_translate("MainWindow", "Compress Output (Lossless)"))
+        self.outputDepthLabel.setText(_translate("MainWindow", "Output Bit Depth"))
+        self.outputScalingLabel.setText(_translate("MainWindow", "Output Scaling"))
+        self.memoryBudgetLabel.setText(_translate("MainWindow", "Memory Budget (GB)"))
+        self.memoryBudgetBox.setSpecialValueText(_translate("MainWindow", "No Limit"))
+        self.batchWorkersLabel.setText(_translate("MainWindow", "Batch Worker Processes"))
+        self.batchWorkersBox.setToolTip(_translate("MainWindow", "Batches filtered at the same time in separate processes (1 runs them one at a time in a pipeline)"))
+        self.resumeCheckbox.setToolTip(_translate("MainWindow", "Continue skips the batches already saved with the same settings (one file per image only)"))
+        self.resumeCheckbox.setText(_translate("MainWindow", "Resume (Skip Batches Already Saved)"))
+        self.stackCacheCheckbox.setText(_translate("MainWindow", "Cache Decoded Images (Skip Decoding on Repeat Runs)"))
+        self.stackCacheSizeLabel.setText(_translate("MainWindow", "Cache Size Limit (GB)"))
+        self.clearStackCacheButton.setText(_translate("MainWindow", "Clear Cache"))
+        self.mainTabWidget.setTabText(self.mainTabWidget.indexOf(self.engineTab), _translate("MainWindow", "Engine Settings"))
         self.mainTabWidget.setTabText(self.mainTabWidget.indexOf(self.openPIVClientTab), _translate("MainWindow", "OpenPIV Client"))
         self.menuSettings.setTitle(_translate("MainWindow", "Settings"))
         self.menuTheme.setTitle(_translate("MainWindow", "Theme"))
@@ -0,0 +1,336 @@
+#Benchmarks of the POD filter and the image cutter on synthetic image stacks - no GUI, display or real data needed
+#Every case of the grid (crop size x snapshots x dtype x workers) is timed, the wall time, throughput and peak memory
+#are saved to a JSON file, and compared with a baseline file saved by an earlier run
+#   python pod_benchmark.py --output new.json --baseline old.json --threshold 0.1
+
+from pathlib import Path
+import argparse
+import multiprocessing
+import platform
+import tempfile
+import shutil
+import json
+import time
+import sys
+import os
+
+#Current File Directory - the worker processes find the functions package from here too
+FILE_PATH = Path(__file__).parent.absolute()
+sys.path.insert(0, str(FILE_PATH))
+
+import numpy as np
+from scipy.ndimage import gaussian_filter
+
+#Every case runs in a new process, so the memory left by one case doesn't change the peak of the next
+from concurrent.futures import ProcessPoolExecutor
+
+from pod_cli import parse_arguments, engine_settings, create_engine, DTYPE_LIST
+from functions.pod_engine import ImageCutterEngine
+from functions.image_writer import ImageWriter
+from functions.stage_timer import reset_peak_rss, peak_rss, stage_totals
+
+CASE_LIST = ['pod', 'cut']
+SOURCE_DTYPE_LIST = ['uint8', 'uint16']
+
+#File describing a synthetic stack in its folder, a stack is only reused if it matches
+#The version changes whenever synthetic_stack makes different images
+STACK_METADATA = 'stack.json'
+STACK_VERSION = 1
+
+
+def parse_benchmark_arguments(arguments = None):
+    parser = argparse.ArgumentParser(description = 'Benchmark the POD filter and the image cutter on synthetic image stacks')
+
+    gridGroup = parser.add_argument_group('grid', 'every combination is a case')
+    gridGroup.add_argument('--cases', nargs = '+', choices = CASE_LIST, default = CASE_LIST)
+    gridGroup.add_argument('--crops', nargs = '+', type = int, default = [128, 256], help = 'side of the square crop of the frames')
+    gridGroup.add_argument('--snapshots', nargs = '+', type = int, default = [50, 200], help = 'image pairs in the stack')
+    gridGroup.add_argument('--dtypes', nargs = '+', choices = DTYPE_LIST, default = ['float64', 'float32'], help = 'precision of the POD filter')
+    gridGroup.add_argument('--workers', nargs = '+', type = int, default = [1, 4], help = 'decoding and writing threads')
+    gridGroup.add_argument('--batch-workers', nargs = '+', type = int, default = [1], help = 'processes filtering batches (POD only)')
+
+    stackGroup = parser.add_argument_group('synthetic stacks')
+    stackGroup.add_argument('--frame-size', type = int, default = 512, help = 'side of a frame, the crops are centred in it')
+    stackGroup.add_argument('--source-dtype', choices = SOURCE_DTYPE_LIST, default = 'uint8')
+    stackGroup.add_argument('--batches', type = int, default = 1, help = 'batches of the POD filter')
+    stackGroup.add_argument('--seed', type = int, default = 0)
+    stackGroup.add_argument('--work-folder', type = Path, help = 'folder of the stacks and outputs (default a temporary folder)')
+
+    runGroup = parser.add_argument_group('run')
+    runGroup.add_argument('--repeats', type = int, default = 3, help = 'runs of every case, the fastest is compared')
+    runGroup.add_argument('--qt', action = 'store_true', help = 'run the Qt threads of the GUI (PODRunner and ImageCutter) instead of the engines')
+    runGroup.add_argument('--output', type = Path, default = Path('pod_benchmark.json'), help = 'results file (default pod_benchmark.json)')
+    runGroup.add_argument('--baseline', type = Path, help = 'results file of an earlier run to compare with')
+    runGroup.add_argument('--threshold', type = float, default = 0.1, help = 'slowdown counted as a regression (default 0.1, 10%%)')
+    runGroup.add_argument('--memory-threshold', type = float, default = 0.25, help = 'growth of the peak memory counted as a regression (default 0.25)')
+
+    args = parser.parse_args(arguments)
+
+    if max(args.crops) > args.frame_size:
+        parser.error('the crops must fit in a frame of %i pixels'%args.frame_size)
+
+    return args
+
+#Folder of nPairs images holding an A (top) and B (bottom) frame of frameSize x frameSize, like a PIV camera
+#The frames are particles over a background that drifts slowly, so the POD filter has something to remove
+#A stack already in the folder is reused if its metadata matches, otherwise it is made again
+def synthetic_stack(folder, nPairs, frameSize, sourceDtype, seed):
+    folder.mkdir(parents = True, exist_ok = True)
+    metadata = {'version': STACK_VERSION, 'seed': seed, 'pairs': nPairs, 'frameSize': frameSize, 'dtype': np.dtype(sourceDtype).name}
+    metadataPath = folder / STACK_METADATA
+
+    imagePaths = [folder / ('synthetic_%04i.tif'%ii) for ii in range(nPairs)]
+    try:
+        with open(metadataPath) as metadataFile:
+            if json.load(metadataFile) == metadata and all(imagePath.exists() for imagePath in imagePaths):
+                return imagePaths
+    except (OSError, ValueError):
+        pass
+
+    #The metadata is written last, so a stack that was cut short is never reused
+    if metadataPath.exists():
+        metadataPath.unlink()
+    for imagePath in folder.glob('synthetic_*.tif'):
+        imagePath.unlink()
+
+    rng = np.random.default_rng(seed)
+    maxValue = np.iinfo(sourceDtype).max
+
+    y, x = np.mgrid[0:2*frameSize, 0:frameSize]
+    background = 0.2 * maxValue * (1 + np.sin(x / frameSize * np.pi) * np.cos(y / frameSize * np.pi)) / 2
+    nParticles = frameSize**2 // 64
+
+    futures = []
+    with ImageWriter() as writer:
+        for ii in range(nPairs):
+            particles = np.zeros((2*frameSize, frameSize))
+            particles[rng.integers(0, 2*frameSize, 2*nParticles), rng.integers(0, frameSize, 2*nParticles)] = rng.uniform(0.5, 1, 2*nParticles)
+            particles = gaussian_filter(particles, 1.0) * 4 * maxValue
+
+            image = background * (1 + 0.2 * np.sin(2 * np.pi * ii / nPairs)) + particles + rng.normal(0, 0.01 * maxValue, particles.shape)
+            image = np.clip(image, 0, maxValue).astype(sourceDtype)
+
+            futures.append(writer.submit(imagePaths[ii], image))
+
+    #The writer is closed, so every image is saved (or failed)
+    for future in futures:
+        if future.exception() is not None:
+            raise future.exception()
+
+    with open(metadataPath, 'w') as metadataFile:
+        json.dump(metadata, metadataFile)
+
+    return imagePaths
+
+#Crop of a side x side square in the middle of the frame - [X1, X2, Y1, Y2]
+def centred_crop(frameSize, side):
+    start = (frameSize - side)//2
+
+    return [start, start + side, start, start + side]
+
+#Cases of the grid, the cutter doesn't depend on the dtype or the batch workers
+def benchmark_cases(args):
+    cases = []
+    for caseType in args.cases:
+        for crop in args.crops:
+            for nPairs in args.snapshots:
+                for workers in args.workers:
+                    if caseType == 'cut':
+                        cases.append({'name': 'cut-%ix%i-%i-w%i'%(crop, crop, nPairs, workers), 'type': caseType,
+                                      'crop': crop, 'snapshots': nPairs, 'dtype': None, 'workers': workers, 'batchWorkers': 1})
+                        continue
+
+                    for dtype in args.dtypes:
+                        for batchWorkers in args.batch_workers:
+                            cases.append({'name': 'pod-%ix%i-%i-%s-w%i-b%i'%(crop, crop, nPairs, dtype, workers, batchWorkers), 'type': caseType,
+                                          'crop': crop, 'snapshots': nPairs, 'dtype': dtype, 'workers': workers, 'batchWorkers': batchWorkers})
+
+    return cases
+
+#Engine settings of a case, built like pod_cli.py does from its arguments
+def case_settings(args, case, imagePaths):
+    crop = centred_crop(args.frame_size, case['crop'])
+    cliArguments = [str(imagePaths[0].parent), '--cut', '--crop'] + [str(value) for value in crop] + ['--quiet',
+                    '--decode-workers', str(case['workers']), '--write-workers', str(case['workers']),
+                    '--batch-workers', str(case['batchWorkers']), '--batches', str(args.batches)]
+
+    if case['type'] == 'cut':
+        cliArguments += ['--cut-only', '--save-crop']
+    else:
+        cliArguments += ['--dtype', case['dtype']]
+
+    return engine_settings(parse_arguments(cliArguments), imagePaths)
+
+#Run a case once in saveFolder, returns the engine (or Qt thread) that ran it
+def run_case(args, case, imagePaths, settings, saveFolder):
+    folder = imagePaths[0].parent
+
+    if args.qt:
+        from functions.pod_functions import ImageCutter, PODRunner
+
+        if case['type'] == 'cut':
+            runner = ImageCutter(imagePaths, folder, settings)
+            runner.saveFolder = saveFolder
+            runner.start()
+            runner.wait()
+            return runner
+
+        #Compute the first batch, then continue with the others like the Continue button
+        runner = PODRunner(imagePaths, folder, settings)
+        runner.saveFolder = saveFolder
+        runner.start()
+        runner.wait()
+        runner.continue_pod = True
+        runner.start()
+        runner.wait()
+        return runner
+
+    if case['type'] == 'cut':
+        engine = ImageCutterEngine(imagePaths, folder, settings)
+        engine.saveFolder = saveFolder
+        engine.save_images()
+        return engine
+
+    engine = create_engine('pod', imagePaths, folder, settings)
+    engine.saveFolder = saveFolder
+    engine.pod_batch(0)
+    engine.continue_batches()
+    return engine
+
+#Run a case args.repeats times, returns its results - the fastest run is the one compared
+def benchmark_case(args, case, imagePaths):
+    settings = case_settings(args, case, imagePaths)
+    saveFolder = imagePaths[0].parent / ('benchmark_%s'%case['name'])
+
+    #Bytes of the cropped A and B frames
+    nBytes = 2 * case['snapshots'] * case['crop']**2 * np.dtype(args.source_dtype).itemsize
+
+    wallTimes = []
+    peaks = []
+    for _ in range(args.repeats):
+        shutil.rmtree(saveFolder, ignore_errors = True)
+
+        reset_peak_rss()
+        startTime = time.perf_counter()
+        engine = run_case(args, case, imagePaths, settings, saveFolder)
+        wallTimes.append(time.perf_counter() - startTime)
+
+        #The engines report failures through their callbacks, so we check what they saved
+        nSaved = len(list(saveFolder.glob('*.tif')))
+        if nSaved != 2 * case['snapshots']:
+            raise RuntimeError('%s saved %i of %i images'%(case['name'], nSaved, 2 * case['snapshots']))
+
+        #Batch workers log their own peak with their stages
+        records = engine.stageTimer.run_records()
+        peaks.append(max([peak_rss() or 0] + [record['peakRss'] or 0 for record in records]))
+
+    shutil.rmtree(saveFolder, ignore_errors = True)
+
+    fastest = int(np.argmin(wallTimes))
+    stages = {stage: round(total['seconds'], 6) for stage, total in stage_totals(records).items()}
+
+    return dict(case, wallTime = wallTimes[fastest], wallTimes = wallTimes, pairsPerSecond = case['snapshots'] / wallTimes[fastest],
+                MBps = nBytes / wallTimes[fastest] / 1024**2, peakRss = max(peaks), stages = stages)
+
+#Machine the benchmarks ran on, results of another machine are only a rough comparison
+def machine_info():
+    return {'platform': platform.platform(), 'processor': platform.processor(), 'cpus': os.cpu_count(),
+            'python': platform.python_version(), 'numpy': np.__version__}
+
+#Compare the results with a baseline, returns the lines to print and the number of regressions
+def compare_results(results, baseline, threshold, memoryThreshold):
+    baselineResults = {result['name']: result for result in baseline['results']}
+
+    lines = []
+    regressions = 0
+    for result in results:
+        if result['name'] not in baselineResults:
+            lines.append('%-36s %8.3f s  (not in the baseline)'%(result['name'], result['wallTime']))
+            continue
+
+        old = baselineResults[result['name']]
+        timeChange = result['wallTime'] / old['wallTime'] - 1
+        memoryChange = result['peakRss'] / old['peakRss'] - 1 if old['peakRss'] > 0 else 0.0
+
+        problems = []
+        if timeChange > threshold:
+            problems.append('slower')
+        if memoryChange > memoryThreshold:
+            problems.append('more memory')
+
+        regressions += len(problems) > 0
+        lines.append('%-36s %8.3f s (%+6.1f%%) %8.1f MB (%+6.1f%%)  %s'%(result['name'], result['wallTime'], timeChange*100,
+                     result['peakRss'] / 1024**2, memoryChange*100, 'REGRESSION: ' + ', '.join(problems) if len(problems) > 0 else 'ok'))
+
+    return lines, regressions
+
+def main(arguments = None):
+    args = parse_benchmark_arguments(arguments)
+
+    #The Qt threads don't need a display
+    if args.qt:
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+    baseline = None
+    if args.baseline is not None:
+        with open(args.baseline) as baselineFile:
+            baseline = json.load(baselineFile)
+
+    if args.work_folder is None:
+        workFolder = tempfile.TemporaryDirectory(prefix = 'pod_benchmark_')
+        folder = Path(workFolder.name)
+    else:
+        workFolder = None
+        folder = args.work_folder
+
+    results = []
+    try:
+        stacks = {}
+        for case in benchmark_cases(args):
+            if case['snapshots'] not in stacks:
+                stackFolder = folder / ('stack_%i_%i_%s'%(case['snapshots'], args.frame_size, args.source_dtype))
+                stacks[case['snapshots']] = synthetic_stack(stackFolder, case['snapshots'], args.frame_size, np.dtype(args.source_dtype), args.seed)
+
+            with ProcessPoolExecutor(max_workers = 1, mp_context = multiprocessing.get_context('spawn')) as executor:
+                result = executor.submit(benchmark_case, args, case, stacks[case['snapshots']]).result()
+            results.append(result)
+
+            print('%-36s %8.3f s %8.1f pairs/s %8.1f MB/s %8.1f MB peak'%(result['name'], result['wallTime'], result['pairsPerSecond'],
+                  result['MBps'], result['peakRss'] / 1024**2), flush = True)
+
+    finally:
+        if workFolder is not None:
+            workFolder.cleanup()
+
+    output = {'machine': machine_info(), 'time': time.strftime('%Y-%m-%d %H:%M:%S'), 'qt': args.qt,
+              'frameSize': args.frame_size, 'sourceDtype': args.source_dtype, 'batches': args.batches,
+              'repeats': args.repeats, 'results': results}
+
+    with open(args.output, 'w') as outputFile:
+        json.dump(output, outputFile, indent = 1)
+
+    print('Results saved in %s'%args.output)
+
+    if baseline is None:
+        return 0
+
+    #The case names don't hold the stacks or the machine, so we say when they differ
+    for key in ['machine', 'qt', 'frameSize', 'sourceDtype', 'batches']:
+        if baseline.get(key) != output[key]:
+            print('Warning: the baseline has a different %s (%s)'%(key, baseline.get(key)))
+
+    lines, regressions = compare_results(results, baseline, args.threshold, args.memory_threshold)
+    print('Compared with %s (threshold %.0f%% time, %.0f%% memory):'%(args.baseline, args.threshold*100, args.memory_threshold*100))
+    for line in lines:
+        print(line)
+
+    if regressions > 0:
+        print('%i of %i cases regressed'%(regressions, len(results)))
+        return 1
+
+    return 0
+
+
+#Run script if it is main
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,253 @@
+#Command line version of the POD filter and the image cutter - runs without Qt or a display, e.g. as a batch job
+#Every folder is processed with the same settings, a folder that fails doesn't stop the others
+#   python pod_cli.py RUN_1 RUN_2 --crop 0 1024 0 512 --flip --modes 1 --batches 4 --batch-workers 8
+
+from pathlib import Path
+import argparse
+import threading
+import time
+import sys
+
+#Current File Directory - the worker processes find the functions package from here too
+FILE_PATH = Path(__file__).parent.absolute()
+sys.path.insert(0, str(FILE_PATH))
+
+from skimage.io import imread
+
+from functions.pod_engine import ImageCutterEngine, PODEngine
+from functions.background_functions import BackgroundEngine, SlidingBackgroundEngine, FrequencyEngine, BACKGROUND_LIST, SLIDING_BACKGROUND_LIST
+from functions.frequency_filter import FREQUENCY_FILTER_LIST
+from functions.stack_cache import DEFAULT_CACHE_FOLDER
+from functions.batch_planner import plan_batches, plan_summary, crop_pixels
+
+#Same choices as the GUI
+FILTER_LIST = ['pod'] + BACKGROUND_LIST + SLIDING_BACKGROUND_LIST + FREQUENCY_FILTER_LIST
+EIG_SOLVER_LIST = ['auto', 'full', 'subset', 'lanczos', 'svd']
+DTYPE_LIST = ['float64', 'float32', 'auto']
+DECODE_BACKEND_LIST = ['thread', 'process']
+OUTPUT_FORMAT_LIST = ['files', 'tiff', 'hdf5', 'chunks']
+OUTPUT_DEPTH_LIST = ['source', 'uint8', 'uint16']
+OUTPUT_SCALING_LIST = ['clip', 'rescale']
+
+
+def parse_arguments(arguments = None):
+    parser = argparse.ArgumentParser(description = 'Filter (or cut) PIV image pairs without the GUI')
+
+    parser.add_argument('folders', nargs = '+', type = Path, help = 'image folders, each one is processed on its own')
+    parser.add_argument('--extension', default = '.tif', help = 'image file extension (default .tif)')
+    parser.add_argument('--cut', action = 'store_true', help = 'every image holds the A (top) and B (bottom) frame')
+    parser.add_argument('--crop', nargs = 4, type = int, metavar = ('X1', 'X2', 'Y1', 'Y2'), help = 'crop of every frame (default the whole frame)')
+    parser.add_argument('--flip', action = 'store_true', help = 'flip the frames left to right')
+
+    #Cutting only saves the A and B frames of every image
+    parser.add_argument('--cut-only', action = 'store_true', help = 'only save the A and B frames of the images (implies --cut)')
+    parser.add_argument('--save-crop', action = 'store_true', help = 'crop the frames saved by --cut-only')
+
+    filterGroup = parser.add_argument_group('filter')
+    filterGroup.add_argument('--filter', choices = FILTER_LIST, default = 'pod')
+    filterGroup.add_argument('--modes', type = int, default = 1, help = 'number of POD modes removed (default 1)')
+    filterGroup.add_argument('--pairs', type = int, help = 'number of image pairs used (default all)')
+    filterGroup.add_argument('--batches', type = int, default = 1, help = 'batches the pairs are split in, each has its own basis')
+    filterGroup.add_argument('--auto-batches', action = 'store_true', help = 'use the fewest batches that fit the memory budget (or half the RAM)')
+    filterGroup.add_argument('--percentile', type = float, default = 10, help = 'exact over the first 256 frames (fewer for large frames), approximate (P-square) after')
+    filterGroup.add_argument('--window', type = int, default = 21, help = 'frames in the sliding window')
+    filterGroup.add_argument('--median-levels', type = int, default = 256, help = 'levels of the sliding median, fewer than the values in the images quantize it')
+    filterGroup.add_argument('--low-cutoff', type = float, default = 0.1, help = 'Hz')
+    filterGroup.add_argument('--high-cutoff', type = float, default = 1.0, help = 'Hz')
+    filterGroup.add_argument('--frame-rate', type = float, default = 15.0, help = 'rate of the image pairs in Hz')
+    filterGroup.add_argument('--remove-modes', action = 'store_true', help = 'remove the POD modes before the frequency filter')
+
+    engineGroup = parser.add_argument_group('engine')
+    engineGroup.add_argument('--dtype', choices = DTYPE_LIST, default = 'float64')
+    engineGroup.add_argument('--check-precision', action = 'store_true', help = 'report how far float32 results are from float64 (projects every tile twice)')
+    engineGroup.add_argument('--eig-solver', choices = EIG_SOLVER_LIST, default = 'auto')
+    engineGroup.add_argument('--streaming', action = 'store_true', help = 'keep the data matrices on disk')
+    engineGroup.add_argument('--scratch-folder', help = 'memory map the data matrices in this folder (relative to the image folder)')
+    engineGroup.add_argument('--decode-workers', type = int, default = 4)
+    engineGroup.add_argument('--decode-backend', choices = DECODE_BACKEND_LIST, default = 'thread')
+    engineGroup.add_argument('--write-workers', type = int, default = 4)
+    engineGroup.add_argument('--batch-workers', type = int, default = 1, help = 'processes filtering batches at the same time')
+    engineGroup.add_argument('--memory-budget', type = float, default = 0, help = 'GB, 0 is no limit')
+    engineGroup.add_argument('--cache', action = 'store_true', help = 'cache decoded images so repeat runs skip decoding')
+    engineGroup.add_argument('--cache-size', type = float, default = 8, help = 'GB')
+    engineGroup.add_argument('--resume', action = 'store_true', help = 'skip the batches already saved with the same settings (--output-format files only)')
+
+    outputGroup = parser.add_argument_group('output')
+    outputGroup.add_argument('--save-folder', help = 'output folder in every image folder (default pod_images, or cut with --cut-only)')
+    outputGroup.add_argument('--output-format', choices = OUTPUT_FORMAT_LIST, default = 'files')
+    outputGroup.add_argument('--compress', action = 'store_true')
+    outputGroup.add_argument('--output-depth', choices = OUTPUT_DEPTH_LIST, default = 'source')
+    outputGroup.add_argument('--output-scaling', choices = OUTPUT_SCALING_LIST, default = 'clip')
+    outputGroup.add_argument('--quiet', action = 'store_true', help = 'only print when a folder is done')
+    outputGroup.add_argument('--progress-rate', type = float, default = 1, help = 'progress lines per second of every stage (default 1)')
+
+    return parser.parse_args(arguments)
+
+#Shape of a frame, the frames are the top and bottom half of the images if they are cut
+def frame_shape(image, cutImages):
+    if cutImages:
+        return (image.shape[0]//2, image.shape[1])
+
+    return image.shape[:2]
+
+#Settings dictionary of the engines, the same keys as the GUI uses
+def engine_settings(args, imageList):
+    cutImages = args.cut or args.cut_only
+    firstImage = imread(imageList[0])
+    frameShape = frame_shape(firstImage, cutImages)
+
+    settings = {}
+    settings['cutImages'] = cutImages
+    settings['flipImage'] = args.flip
+    settings['cropList'] = list(args.crop) if args.crop is not None else [0, frameShape[1], 0, frameShape[0]]
+    settings['nModes'] = args.modes
+
+    settings['dtype'] = args.dtype
+    settings['checkPrecision'] = args.check_precision
+    settings['eigSolver'] = args.eig_solver
+    settings['streaming'] = args.streaming
+    settings['decodeWorkers'] = args.decode_workers
+    settings['decodeBackend'] = args.decode_backend
+    settings['writeWorkers'] = args.write_workers
+    settings['batchWorkers'] = args.batch_workers
+    settings['resume'] = args.resume
+    settings['progressRate'] = args.progress_rate
+    settings['outputFormat'] = args.output_format
+    settings['compressOutput'] = args.compress
+    settings['outputDepth'] = args.output_depth
+    settings['outputScaling'] = args.output_scaling
+
+    settings['memoryBudget'] = args.memory_budget * 1024**3 if args.memory_budget > 0 else None
+
+    if args.scratch_folder is None:
+        settings['scratchFolder'] = None
+    else:
+        settings['scratchFolder'] = imageList[0].parent / args.scratch_folder
+
+    if args.cache:
+        settings['cacheFolder'] = DEFAULT_CACHE_FOLDER
+        settings['cacheSize'] = args.cache_size * 1024**3
+    else:
+        settings['cacheFolder'] = None
+
+    #Cutting
+    settings['saveCrop'] = args.save_crop
+
+    #Background and frequency filters
+    settings['percentile'] = args.percentile
+    settings['window'] = args.window
+    settings['medianLevels'] = args.median_levels
+    settings['lowCutoff'] = args.low_cutoff
+    settings['highCutoff'] = args.high_cutoff
+    settings['frameRate'] = args.frame_rate
+    settings['removeModes'] = args.remove_modes
+
+    if args.filter in FREQUENCY_FILTER_LIST:
+        settings['frequencyFilter'] = args.filter
+    elif args.filter != 'pod':
+        settings['background'] = args.filter
+
+    #Pairs are spread over the batches so none are dropped
+    nPairs = len(imageList) if cutImages else len(imageList)//2
+    if args.pairs is not None:
+        nPairs = min(args.pairs, nPairs)
+
+    nPixels = crop_pixels(frameShape, settings['cropList'])
+    plan = plan_batches(settings, nPixels, nPairs, firstImage.dtype, settings['memoryBudget'], None if args.auto_batches else args.batches)
+
+    settings['batchSizes'] = plan['batchSizes']
+    settings['nBatches'] = len(plan['batchSizes'])
+    settings['nPairs'] = max(plan['batchSizes'])
+
+    #The pipeline holds as many batches as fit the budget the batches were planned for
+    settings['memoryBudget'] = plan['memoryBudget']
+
+    if not args.quiet and not args.cut_only:
+        print('[%s] %s'%(imageList[0].parent.name, plan_summary(plan)))
+
+    return settings
+
+def create_engine(filterType, imageList, folder, settings, **callbacks):
+    if filterType == 'pod':
+        return PODEngine(imageList, folder, settings, **callbacks)
+    elif filterType in SLIDING_BACKGROUND_LIST:
+        return SlidingBackgroundEngine(imageList, folder, settings, **callbacks)
+    elif filterType in FREQUENCY_FILTER_LIST:
+        return FrequencyEngine(imageList, folder, settings, **callbacks)
+
+    return BackgroundEngine(imageList, folder, settings, **callbacks)
+
+#Filter (or cut) the images of one folder, returns True if it worked
+def process_folder(args, folder):
+    imageList = sorted(folder.glob('*%s'%args.extension))
+    if len(imageList) == 0:
+        print('[%s] No %s images'%(folder, args.extension))
+        return False
+
+    settings = engine_settings(args, imageList)
+
+    #The engines tell us about failures through their callbacks
+    #The pipeline stages report from their own threads, so lines are printed one at a time
+    failures = []
+    printLock = threading.Lock()
+    def progress(percent, label):
+        if not args.quiet:
+            with printLock:
+                print('[%s] %5.1f%% %s'%(folder.name, percent, label), flush = True)
+
+    def finished(success):
+        if not success:
+            failures.append(True)
+
+    startTime = time.perf_counter()
+
+    if args.cut_only:
+        engine = ImageCutterEngine(imageList, folder, settings, progress = progress, saved = finished)
+        engine.saveFolder = folder / (args.save_folder or 'cut')
+        engine.save_images()
+
+    else:
+        engine = create_engine(args.filter, imageList, folder, settings, progress = progress, computed = finished, saved = finished)
+        engine.saveFolder = folder / (args.save_folder or 'pod_images')
+
+        #When resuming we start with the first batch that isn't saved yet
+        pendingBatches = engine.pending_batches()
+        if len(pendingBatches) == 0:
+            print('[%s] Every batch is already saved in %s'%(folder, engine.saveFolder))
+            return True
+
+        engine.pod_batch(pendingBatches[0])
+        if len(failures) == 0:
+            engine.continue_batches()
+
+    if len(failures) > 0:
+        print('[%s] Failed'%folder)
+        return False
+
+    print('[%s] Done in %.1f s, saved in %s'%(folder, time.perf_counter() - startTime, engine.saveFolder))
+    print('[%s] Stages: %s'%(folder, engine.stage_summary()))
+    return True
+
+def main(arguments = None):
+    args = parse_arguments(arguments)
+
+    failedFolders = []
+    for folder in args.folders:
+        try:
+            if not process_folder(args, folder):
+                failedFolders.append(folder)
+
+        except Exception as e:
+            print('[%s] Failed: %s'%(folder, e))
+            failedFolders.append(folder)
+
+    if len(failedFolders) > 0:
+        print('%i of %i folders failed: %s'%(len(failedFolders), len(args.folders), ', '.join([str(folder) for folder in failedFolders])))
+        return 1
+
+    return 0
+
+
+#Run script if it is main
+if __name__ == '__main__':
+    sys.exit(main())